@@ -55,10 +55,23 @@ router.post('/start', authenticate, async (req: AuthRequest, res) => {
         // Always attempt generation if we have topics, even without resume
         if (topics && topics.length > 0) {
             console.log("Generating questions..."); // DEBUG
+            // Start at the level the user's ratings from earlier sessions point to
+            let startDifficulty: number | undefined;
+            try {
+                const startResponse = await axios.post(`${ML_SERVICE_URL}/adaptive/start`, {
+                    user_id: userId,
+                    topics: topics
+                });
+                startDifficulty = startResponse.data.difficulty;
+            } catch (adaptiveErr: any) {
+                console.error("Adaptive start lookup failed:", adaptiveErr.message);
+            }
+
             try {
                 const genResponse = await axios.post(`${ML_SERVICE_URL}/generate_questions`, {
                     resume_text: resume_text,
-                    topics: topics || ['General']
+                    topics: topics || ['General'],
+                    difficulty: startDifficulty
                 });
 
                 // The ML service returns { questions: [...] }
@@ -158,6 +171,40 @@ router.post('/answer', authenticate, async (req: AuthRequest, res) => {
             .eq('id', questionId)
             .single();
 
+        // Resume text for follow-up generation; fetched up front so the next question can be prefetched
+        let resumeText: string | null = null;
+        const { data: sessionRow } = await supabase
+            .from('interview_sessions')
+            .select('resume_profile_id')
+            .eq('id', sessionId)
+            .single();
+
+        if (sessionRow?.resume_profile_id) {
+            const { data: profile } = await supabase
+                .from('resume_profiles')
+                .select('resume_text')
+                .eq('id', sessionRow.resume_profile_id)
+                .single();
+            resumeText = profile?.resume_text || null;
+        }
+
+        const currentDifficulty = Math.max(1, Math.min(5, Number(question?.difficulty_level) || 3));
+        const followUpTopics = [question?.topic || 'General'];
+        const alreadyAsked = question?.question_text ? [question.question_text] : [];
+
+        // Start generating the candidate next questions while this answer is scored (fire and forget)
+        if (resumeText) {
+            axios.post(`${ML_SERVICE_URL}/prefetch_questions`, {
+                session_id: sessionId,
+                resume_text: resumeText,
+                topics: followUpTopics,
+                current_difficulty: currentDifficulty,
+                exclude: alreadyAsked,
+                user_id: req.user.id,
+                topic: followUpTopics[0]
+            }).catch((prefetchErr) => console.error("Question prefetch failed:", prefetchErr.message));
+        }
+
         const payload = {
             answer_text: answerText,
             audio_url: audioUrl,
@@ -230,47 +277,55 @@ router.post('/answer', authenticate, async (req: AuthRequest, res) => {
             if (voiceError) console.error("Error saving voice metrics:", voiceError);
         }
 
-        // 4. Generate Next Question (Adaptive)
+        // 4. Update the user's rating for this topic and get the next difficulty
+        // Only a real text score should move the rating; voice answers carry placeholder scores
+        let nextDifficulty = currentDifficulty;
+        if (answerText && answerText.trim() && typeof mlResponse.final_score === 'number') {
+            try {
+                const abilityResponse = await axios.post(`${ML_SERVICE_URL}/adaptive/record`, {
+                    user_id: req.user.id,
+                    topic: followUpTopics[0],
+                    difficulty: currentDifficulty,
+                    score: mlResponse.final_score
+                });
+                nextDifficulty = abilityResponse.data.next_difficulty || currentDifficulty;
+            } catch (adaptiveErr: any) {
+                console.error("Adaptive update failed:", adaptiveErr.message);
+            }
+        }
+
+        // 5. Generate Next Question (Adaptive)
         let nextQuestion = null;
         try {
-            // Fetch session to get resume_id
-            const { data: session } = await supabase
-                .from('interview_sessions')
-                .select('resume_profile_id')
-                .eq('id', sessionId)
-                .single();
+            if (resumeText) {
 
-            if (session?.resume_profile_id) {
-                const { data: profile } = await supabase
-                    .from('resume_profiles')
-                    .select('resume_text')
-                    .eq('id', session.resume_profile_id)
-                    .single();
-
-                if (profile?.resume_text) {
-                    const genResponse = await axios.post(`${ML_SERVICE_URL}/generate_questions`, {
-                        resume_text: profile.resume_text,
-                        topics: [question?.topic || 'General'],
-                        // We could pass difficulty here if we updated the ML service to accept it
-                    });
-
-                    const newQuestions = genResponse.data.questions;
-                    if (newQuestions && newQuestions.length > 0) {
-                        const q = newQuestions[0];
-                        // Insert new question linked to session
-                        const { data: insertedQ, error: insError } = await supabase
-                            .from('questions')
-                            .insert([{
-                                ...q,
-                                session_id: sessionId,
-                                difficulty_level: Math.max(1, Math.min(5, Number(q.difficulty_level) || 3)),
-                                ideal_answer_keywords: Array.isArray(q.ideal_answer_keywords) ? q.ideal_answer_keywords : []
-                            }])
-                            .select()
-                            .single();
-
-                        if (!insError) nextQuestion = insertedQ;
-                    }
+                // Picks up the prefetched question for this difficulty when it is ready
+                const genResponse = await axios.post(`${ML_SERVICE_URL}/generate_questions`, {
+                    resume_text: resumeText,
+                    topics: followUpTopics,
+                    // Only the first question is used, and the one just answered shouldn't come back
+                    count: 1,
+                    exclude: alreadyAsked,
+                    difficulty: nextDifficulty,
+                    session_id: sessionId
+                });
+
+                const newQuestions = genResponse.data.questions;
+                if (newQuestions && newQuestions.length > 0) {
+                    const q = newQuestions[0];
+                    // Insert new question linked to session
+                    const { data: insertedQ, error: insError } = await supabase
+                        .from('questions')
+                        .insert([{
+                            ...q,
+                            session_id: sessionId,
+                            difficulty_level: Math.max(1, Math.min(5, Number(q.difficulty_level) || 3)),
+                            ideal_answer_keywords: Array.isArray(q.ideal_answer_keywords) ? q.ideal_answer_keywords : []
+                        }])
+                        .select()
+                        .single();
+
+                    if (!insError) nextQuestion = insertedQ;
                 }
             }
         } catch (genErr) {
@@ -0,0 +1,11 @@
+-- Migration: One confidence_metrics row per answer
+-- Lets ml_service/research/reanalyze_audio.py upsert recomputed metrics (ON CONFLICT (answer_id))
+
+-- Keep only the newest row for answers that were analyzed more than once
+DELETE FROM confidence_metrics cm
+USING confidence_metrics newer
+WHERE cm.answer_id = newer.answer_id
+  AND (cm.created_at, cm.id) < (newer.created_at, newer.id);
+
+CREATE UNIQUE INDEX IF NOT EXISTS confidence_metrics_answer_id_key
+ON confidence_metrics (answer_id);
@@ -0,0 +1,21 @@
+-- Migration: Add skill_ratings table for the adaptive difficulty engine
+-- One ability estimate (Elo rating) per user and topic, written by the ML service
+-- Rebuild from history with: python -m app.services.adaptive --rebuild (from ml_service/)
+
+CREATE TABLE IF NOT EXISTS skill_ratings (
+    user_id UUID REFERENCES users(id) ON DELETE CASCADE,
+    topic TEXT NOT NULL, -- lowercased topic name
+    rating NUMERIC NOT NULL,
+    answers INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (user_id, topic)
+);
+
+-- Enable Row Level Security
+ALTER TABLE skill_ratings ENABLE ROW LEVEL SECURITY;
+
+-- RLS Policy: Users can view their own ratings (the ML service writes through its own connection)
+CREATE POLICY "Users can view their own skill ratings"
+ON skill_ratings
+FOR SELECT
+USING (user_id = auth.uid());
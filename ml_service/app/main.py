@@ -1,13 +1,24 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request, WebSocket, WebSocketDisconnect, BackgroundTasks
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import List, Optional
-import shutil
-import os
-from app.services.resume_parser import parse_resume_pdf
-from app.services.scorer import score_answer_text
-from app.services.audio_analyzer import analyze_audio_file
-from app.services.adaptive import suggest_next_difficulty
-from app.services.generator import generate_interview_questions
+import time
+import json
+from app.services.resume_parser import parse_resume_bytes, TAXONOMY_VERSION
+from app.services.pdf_extract import shutdown_pdf_pool, ResumeTooLargeError, InvalidPdfError, RESUME_MAX_BYTES
+from app.services.scorer import score_answer_text, score_answers_batch
+from app.services.prescorer import prescorer_stats
+from app.services.audio_pool import analyze_audio_bytes, start_pool, shutdown_pool, pool_status, PoolBusyError, PoolBrokenError
+from app.services.audio_stream import open_stream, close_stream, active_streams, TooManyStreamsError
+from app.services.cache import all_stats as cache_stats
+from app.services.llm_gateway import close_client as close_llm_client, gateway_stats
+from app.services.adaptive import suggest_next_difficulty, ability_store, start_flusher, stop_flusher
+from app.services.question_bank import get_questions, stream_questions
+from app.services.prefetch import start_prefetch, take_prefetched, prefetch_stats
+from app.services.model_registry import warmup, model_report
+from app.services.metrics import render_metrics, observe_timings, REQUEST_SECONDS, IN_FLIGHT, WORK_QUEUE
+from app.services.profiler import profiler, PROFILER_ENABLED
 
 app = FastAPI(title="AI Interview ML Service")
 
@@ -18,31 +29,145 @@ class ScoreRequest(BaseModel):
     ideal_keywords: Optional[List[str]] = None
     ideal_answer_text: Optional[str] = None
 
+class BatchScoreItem(BaseModel):
+    answer_text: Optional[str] = None
+    question_text: str
+    ideal_keywords: Optional[List[str]] = None
+    ideal_answer_text: Optional[str] = None
+
+class BatchScoreRequest(BaseModel):
+    answers: List[BatchScoreItem]
+    # Let several short answers share one LLM prompt
+    pack_short: bool = False
+
 class DifficultyRequest(BaseModel):
     current_difficulty: int
     last_score: float
 
+class AbilityRecord(BaseModel):
+    user_id: str
+    topic: str
+    difficulty: int
+    score: float
+
+class AbilityLookup(BaseModel):
+    user_id: str
+    topic: str
+
+class AbilityBatch(BaseModel):
+    items: List[AbilityLookup]
+
+class SessionStart(BaseModel):
+    user_id: str
+    topics: List[str]
+
 class QuestionParams(BaseModel):
     resume_text: str
     topics: List[str]
+    count: int = 3
+    difficulty: Optional[int] = None
+    # Question texts already asked in this session
+    exclude: Optional[List[str]] = None
+    # With a difficulty, lets the request pick up a question prefetched for this session
+    session_id: Optional[str] = None
+
+class PrefetchParams(BaseModel):
+    session_id: str
+    resume_text: str
+    topics: List[str]
+    current_difficulty: int
+    count: int = 1
+    exclude: Optional[List[str]] = None
+    # With both, the candidate levels come from the user's adaptive rating for the topic
+    user_id: Optional[str] = None
+    topic: Optional[str] = None
+
+_route_paths = None
+
+@app.middleware("http")
+async def track_requests(request: Request, call_next):
+    # Label by route template only, so unknown paths can't blow up the series count
+    global _route_paths
+    if _route_paths is None:
+        _route_paths = {route.path for route in app.routes}
+    path = request.url.path if request.url.path in _route_paths else "other"
+    IN_FLIGHT.inc(path=path)
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        IN_FLIGHT.dec(path=path)
+        REQUEST_SECONDS.observe(time.perf_counter() - started, method=request.method, path=path, status=status)
+
+@app.on_event("startup")
+def on_startup():
+    start_pool()
+    # Models load on first use unless WARMUP lists them
+    warmup()
+    start_flusher()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    shutdown_pool()
+    shutdown_pdf_pool()
+    await close_llm_client()
+    await stop_flusher()
 
 @app.get("/")
 def health_check():
-    return {"status": "healthy"}
+    return {"status": "healthy", "audio_pool": pool_status(), "llm": gateway_stats(), "prefetch": prefetch_stats(), "prescorer": prescorer_stats()}
+
+@app.get("/models")
+def get_models():
+    # Load time and RSS growth per model in this process (audio workers load their own Vosk)
+    return model_report()
+
+@app.get("/metrics")
+def get_metrics():
+    # Prometheus text format; queue gauges are sampled at scrape time
+    status = pool_status()
+    WORK_QUEUE.set(status["pending"], queue="audio_pool")
+    WORK_QUEUE.set(active_streams(), queue="audio_streams")
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.post("/profiler/start")
+def start_profiler(interval: float = 0.01):
+    # Sampling profiler for this process; only available with PROFILER_ENABLED=1
+    if not PROFILER_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiler is disabled")
+    return {"started": profiler.start(interval), "interval": interval}
+
+@app.post("/profiler/stop")
+def stop_profiler(top: int = 200):
+    if not PROFILER_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiler is disabled")
+    return profiler.stop(top)
+
+@app.get("/profiler")
+def get_profiler(top: int = 200):
+    if not PROFILER_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiler is disabled")
+    return profiler.report(top)
+
+@app.get("/cache_stats")
+def get_cache_stats():
+    return cache_stats()
 
 @app.post("/parse_resume")
 async def parse_resume(file: UploadFile = File(...)):
-    temp_file = f"temp_{file.filename}"
-    with open(temp_file, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    
+    # Read from the (spooled) upload directly; one byte past the cap is enough to reject it
+    data = await file.read(RESUME_MAX_BYTES + 1)
     try:
-        skills, text = parse_resume_pdf(temp_file)
-    finally:
-        if os.path.exists(temp_file):
-            os.remove(temp_file)
-            
-    return {"skills": skills, "extracted_text": text[:500] + "..."}
+        skills, text, pages = await parse_resume_bytes(data)
+    except ResumeTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except InvalidPdfError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {"skills": skills, "extracted_text": text[:500] + "...", "pages": pages, "taxonomy_version": TAXONOMY_VERSION}
 
 @app.post("/score_answer")
 async def score_answer(request: ScoreRequest):
@@ -78,7 +203,7 @@ async def score_answer(request: ScoreRequest):
     ideal_answer = request.ideal_answer_text if request.ideal_answer_text else ""
     ideal_keywords = request.ideal_keywords if request.ideal_keywords else []
     
-    scores = score_answer_text(final_text, request.question_text, ideal_answer, ideal_keywords)
+    scores = await score_answer_text(final_text, request.question_text, ideal_answer, ideal_keywords)
     
     return {
         **scores,
@@ -86,18 +211,181 @@ async def score_answer(request: ScoreRequest):
         "audio_metrics": audio_metrics
     }
 
+@app.post("/score_answers_batch")
+async def score_answers(request: BatchScoreRequest):
+    items = [
+        {
+            "answer_text": item.answer_text or "",
+            "question_text": item.question_text,
+            "ideal_answer_text": item.ideal_answer_text or "",
+            "ideal_keywords": item.ideal_keywords or [],
+        }
+        for item in request.answers
+    ]
+    results = await score_answers_batch(items, pack_short=request.pack_short)
+    return {"results": results}
+
 @app.post("/analyze_audio")
 async def analyze_audio(file: UploadFile = File(...)):
-    # Process directly from memory/spooled temp file
-    metrics = analyze_audio_file(file.file)
+    # Decoding and ASR run in the audio worker pool so the event loop stays free
+    audio_bytes = await file.read()
+    try:
+        metrics = await analyze_audio_bytes(audio_bytes)
+    except PoolBusyError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except PoolBrokenError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    # Stages ran in a worker process; record their timings here (once per analysis, not for cache hits or coalesced waiters)
+    if not metrics.get("cached") and not metrics.get("coalesced"):
+        observe_timings("audio", metrics.get("timings"))
     return metrics
 
+@app.post("/analyze_audio/stream")
+async def analyze_audio_stream(request: Request, format: str = "webm"):
+    # Chunked upload: every chunk is decoded and recognized as soon as it arrives
+    try:
+        analyzer = await run_in_threadpool(open_stream, format)
+    except TooManyStreamsError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+    try:
+        async for chunk in request.stream():
+            if chunk:
+                await run_in_threadpool(analyzer.feed, chunk)
+        final = await run_in_threadpool(analyzer.finish)
+        observe_timings("audio_stream", final.get("timings"))
+        return final
+    finally:
+        close_stream(analyzer)
+
+@app.websocket("/ws/analyze_audio")
+async def analyze_audio_ws(websocket: WebSocket, format: str = "webm"):
+    # Binary messages carry audio chunks, the text message "end" finishes the answer
+    await websocket.accept()
+    try:
+        analyzer = await run_in_threadpool(open_stream, format)
+    except TooManyStreamsError as e:
+        await websocket.close(code=1013, reason=str(e))
+        return
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            if message.get("bytes"):
+                partial = await run_in_threadpool(analyzer.feed, message["bytes"])
+                await websocket.send_json({"type": "partial", **partial})
+            elif message.get("text") == "end":
+                final = await run_in_threadpool(analyzer.finish)
+                observe_timings("audio_stream", final.get("timings"))
+                await websocket.send_json({"type": "final", **final})
+                await websocket.close()
+                return
+    except WebSocketDisconnect:
+        pass
+    finally:
+        close_stream(analyzer)
+
+@app.post("/prefetch_questions")
+async def prefetch_questions(params: PrefetchParams):
+    # Call as soon as an answer comes in; the matching question is picked up by /generate_questions
+    candidates = None
+    if params.user_id and params.topic:
+        candidates = await run_in_threadpool(
+            ability_store.candidate_difficulties, params.user_id, params.topic, params.current_difficulty
+        )
+    difficulties = start_prefetch(
+        params.session_id,
+        params.resume_text,
+        params.topics,
+        params.current_difficulty,
+        count=params.count,
+        exclude=params.exclude,
+        difficulties=candidates,
+    )
+    return {"prefetching": difficulties}
+
 @app.post("/suggest_difficulty")
 def suggest_difficulty(request: DifficultyRequest):
     new_difficulty = suggest_next_difficulty(request.current_difficulty, request.last_score)
     return {"suggested_difficulty": new_difficulty}
 
+@app.post("/adaptive/record")
+def record_ability(request: AbilityRecord):
+    # Updates the user's rating for the topic and returns the next difficulty
+    return ability_store.record(request.user_id, request.topic, request.difficulty, request.score)
+
+@app.post("/adaptive/next_batch")
+def next_difficulties(request: AbilityBatch):
+    # One storage round trip for any number of (user, topic) pairs
+    return {"results": ability_store.estimates([(item.user_id, item.topic) for item in request.items])}
+
+@app.post("/adaptive/start")
+def start_difficulty(request: SessionStart):
+    per_topic, difficulty = ability_store.starting_difficulty(request.user_id, request.topics)
+    return {"difficulty": difficulty, "per_topic": per_topic}
+
+@app.get("/adaptive/stats")
+def adaptive_stats():
+    return ability_store.stats()
+
 @app.post("/generate_questions")
-def generate_questions(params: QuestionParams):
-    questions = generate_interview_questions(params.resume_text, params.topics)
+async def generate_questions(params: QuestionParams, background_tasks: BackgroundTasks):
+    if params.session_id and params.difficulty:
+        prefetched = await take_prefetched(params.session_id, params.difficulty)
+        if prefetched:
+            return {"questions": prefetched}
+
+    # Served from the question bank when possible; misses fall back to the LLM
+    questions = await get_questions(
+        params.resume_text,
+        params.topics,
+        count=params.count,
+        difficulty=params.difficulty,
+        exclude=params.exclude,
+        background_tasks=background_tasks,
+    )
     return {"questions": questions}
+
+def _stream_event(name: str, data, ndjson: bool):
+    if ndjson:
+        return json.dumps({"event": name, "data": data}) + "\n"
+    return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/generate_questions/stream")
+async def generate_questions_stream(params: QuestionParams, request: Request, background_tasks: BackgroundTasks):
+    # Same input as /generate_questions, but each question is sent the moment it is ready:
+    # "question" events, then "done" (or "error"). SSE by default, NDJSON with Accept: application/x-ndjson
+    ndjson = "application/x-ndjson" in request.headers.get("accept", "")
+
+    async def events():
+        sent = 0
+        try:
+            prefetched = None
+            if params.session_id and params.difficulty:
+                prefetched = await take_prefetched(params.session_id, params.difficulty)
+            if prefetched:
+                for question in prefetched:
+                    sent += 1
+                    yield _stream_event("question", question, ndjson)
+            else:
+                async for question in stream_questions(
+                    params.resume_text,
+                    params.topics,
+                    count=params.count,
+                    difficulty=params.difficulty,
+                    exclude=params.exclude,
+                    background_tasks=background_tasks,
+                ):
+                    sent += 1
+                    yield _stream_event("question", question, ndjson)
+            yield _stream_event("done", {"count": sent}, ndjson)
+        except Exception as e:
+            print(f"Error streaming questions: {e}")
+            yield _stream_event("error", {"error": str(e), "count": sent}, ndjson)
+
+    return StreamingResponse(
+        events(),
+        media_type="application/x-ndjson" if ndjson else "text/event-stream",
+        # Don't let proxies buffer the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,13 +1,372 @@
+import os
+import math
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+from starlette.concurrency import run_in_threadpool
+
 def suggest_next_difficulty(current_difficulty: int, last_score: float):
     # Simple ELO-like adjustment
     # Score is 0-100
-    
+
     next_difficulty = current_difficulty
-    
+
     if last_score > 80:
         next_difficulty += 1
     elif last_score < 50:
         next_difficulty -= 1
-        
+
     # Clamp between 1 and 5
     return max(1, min(5, next_difficulty))
+
+
+# Per-user, per-topic ability estimates (Elo, with every question as an opponent
+# whose rating is set by its difficulty level). Each scored answer moves the
+# estimate by k * (score - expected score); k shrinks as answers accumulate, so
+# a new candidate converges in a few questions and then settles. The next
+# question is the level the candidate is expected to score ADAPTIVE_TARGET on.
+#
+# Ratings live in memory and are written behind to Postgres (skill_ratings,
+# database/migration_skill_ratings.sql) every ADAPTIVE_FLUSH_SECONDS. Without
+# DATABASE_URL (or psycopg2) the store is memory only. Run a single writer
+# process per database: concurrent workers would overwrite each other's rows.
+
+# DATABASE_URL also comes from .env when run as a script (--rebuild)
+load_dotenv()
+
+DATABASE_URL = os.environ.get("DATABASE_URL")
+ADAPTIVE_TARGET = float(os.environ.get("ADAPTIVE_TARGET", "0.7"))
+ADAPTIVE_START_DIFFICULTY = int(os.environ.get("ADAPTIVE_START_DIFFICULTY", "2"))
+ADAPTIVE_FLUSH_SECONDS = float(os.environ.get("ADAPTIVE_FLUSH_SECONDS", "5"))
+# Users kept in memory; the least recently used clean users are dropped beyond this
+ADAPTIVE_MAX_USERS = int(os.environ.get("ADAPTIVE_MAX_USERS", "20000"))
+
+BASE_RATING = 1000.0
+# Rating gap between adjacent difficulty levels: a candidate rated at level 4
+# is expected to score 64% on a level-3 question and 50% on a level-4 one
+LEVEL_STEP = 100.0
+# Large first steps so a strong or weak candidate moves a level within two or three answers
+K_MAX = 240.0
+K_MIN = 32.0
+# Answers after which k is halfway between K_MAX and K_MIN
+K_DECAY = 4.0
+# An estimate is "stable" once it has this many answers and the last update moved it less than STABLE_DELTA
+STABLE_ANSWERS = 4
+STABLE_DELTA = 20.0
+# How much of a user's other-topic average carries over to a topic they haven't answered yet
+TRANSFER_WEIGHT = 0.5
+
+
+def question_rating(difficulty: int):
+    return BASE_RATING + (difficulty - 3) * LEVEL_STEP
+
+
+def expected_score(rating: float, difficulty: int):
+    """Expected score (0-1) of a candidate with this rating on a question of this difficulty."""
+    return 1.0 / (1.0 + 10 ** ((question_rating(difficulty) - rating) / 400.0))
+
+
+def k_factor(answers: int):
+    return K_MIN + (K_MAX - K_MIN) / (1.0 + answers / K_DECAY)
+
+
+def difficulty_for(rating: float):
+    """The level whose expected score is closest to ADAPTIVE_TARGET."""
+    target = rating + 400.0 * math.log10(1.0 / ADAPTIVE_TARGET - 1.0)
+    return max(1, min(5, int(round(3 + (target - BASE_RATING) / LEVEL_STEP))))
+
+
+# Rating at which difficulty_for() picks ADAPTIVE_START_DIFFICULTY
+DEFAULT_RATING = question_rating(ADAPTIVE_START_DIFFICULTY) - 400.0 * math.log10(1.0 / ADAPTIVE_TARGET - 1.0)
+
+
+def _topic_key(topic: str):
+    return (topic or "general").strip().lower()
+
+
+def _updated(entry: dict, difficulty: int, score: float):
+    # score is 0-100 like ai_scores.final_score
+    outcome = max(0.0, min(1.0, score / 100.0))
+    delta = k_factor(entry["answers"]) * (outcome - expected_score(entry["rating"], difficulty))
+    return {"rating": entry["rating"] + delta, "answers": entry["answers"] + 1, "last_delta": delta}
+
+
+def _describe(topic: str, entry: dict):
+    return {
+        "topic": topic,
+        "rating": round(entry["rating"], 1),
+        "answers": entry["answers"],
+        "next_difficulty": difficulty_for(entry["rating"]),
+        "stable": entry["answers"] >= STABLE_ANSWERS and abs(entry.get("last_delta", STABLE_DELTA)) < STABLE_DELTA,
+    }
+
+
+class AbilityStore:
+    def __init__(self, database_url: str = None):
+        self.database_url = database_url
+        # user_id -> {topic_key: {"rating", "answers", "last_delta"}}, LRU ordered
+        self._users = OrderedDict()
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._stats = {"updates": 0, "skipped_updates": 0, "db_loads": 0, "load_errors": 0, "flushed_rows": 0, "flush_errors": 0}
+
+    # ---- persistence
+
+    def _connect(self):
+        if self._db is None or self._db.closed:
+            import psycopg2
+            self._db = psycopg2.connect(self.database_url)
+            self._db.autocommit = True
+        return self._db
+
+    def _load_users(self, user_ids: list):
+        """
+        Pulls the stored ratings of users not in memory yet (one query for all of them).
+        Returns the users whose ratings couldn't be read; they are left out of memory,
+        so the next call retries instead of treating them as new users.
+        """
+        with self._lock:
+            missing = [u for u in dict.fromkeys(user_ids) if u not in self._users]
+        if not missing:
+            return set()
+        loaded = {u: {} for u in missing}
+        if self.database_url:
+            try:
+                with self._db_lock:
+                    with self._connect().cursor() as cur:
+                        cur.execute(
+                            "SELECT user_id::text, topic, rating, answers FROM skill_ratings WHERE user_id::text = ANY(%s)",
+                            (missing,),
+                        )
+                        for user_id, topic, rating, answers in cur.fetchall():
+                            loaded[user_id][topic] = {"rating": float(rating), "answers": int(answers)}
+                self._stats["db_loads"] += 1
+            except Exception as e:
+                print(f"Loading skill ratings failed, using defaults for now: {e}")
+                self._stats["load_errors"] += 1
+                self._db = None
+                return set(missing)
+        with self._lock:
+            for user_id, topics in loaded.items():
+                # A concurrent update may have created the user meanwhile; keep its newer values
+                current = self._users.setdefault(user_id, {})
+                for topic, entry in topics.items():
+                    current.setdefault(topic, entry)
+            self._evict()
+        return set()
+
+    def _evict(self):
+        dirty_users = {user_id for user_id, _ in self._dirty}
+        for user_id in list(self._users):
+            if len(self._users) <= ADAPTIVE_MAX_USERS:
+                break
+            if user_id not in dirty_users:
+                del self._users[user_id]
+
+    def flush(self):
+        """Writes every changed rating to Postgres. Returns the number of rows written."""
+        with self._lock:
+            if not self.database_url:
+                # Memory only: nothing to write, don't let the dirty set grow
+                self._dirty.clear()
+                return 0
+            if not self._dirty:
+                return 0
+            rows = [
+                (user_id, topic, self._users[user_id][topic]["rating"], self._users[user_id][topic]["answers"])
+                for user_id, topic in self._dirty
+                if user_id in self._users and topic in self._users[user_id]
+            ]
+            pending = set(self._dirty)
+            self._dirty.clear()
+        try:
+            with self._db_lock:
+                with self._connect().cursor() as cur:
+                    cur.executemany(
+                        """
+                        INSERT INTO skill_ratings (user_id, topic, rating, answers, updated_at)
+                        VALUES (%s, %s, %s, %s, NOW())
+                        ON CONFLICT (user_id, topic)
+                        DO UPDATE SET rating = EXCLUDED.rating, answers = EXCLUDED.answers, updated_at = NOW()
+                        """,
+                        rows,
+                    )
+            self._stats["flushed_rows"] += len(rows)
+            return len(rows)
+        except Exception as e:
+            print(f"Writing skill ratings failed, will retry: {e}")
+            self._stats["flush_errors"] += 1
+            self._db = None
+            with self._lock:
+                self._dirty |= pending
+            return 0
+
+    # ---- estimates
+
+    def _entry(self, user_id: str, topic_key: str):
+        # Caller holds the lock and has loaded the user (or failed to, then it isn't in memory)
+        topics = self._users.get(user_id, {})
+        if user_id in self._users:
+            self._users.move_to_end(user_id)
+        entry = topics.get(topic_key)
+        if entry is not None:
+            return entry
+        # First answer on this topic: start between the default and the user's other topics
+        others = [e["rating"] for e in topics.values() if e["answers"]]
+        rating = DEFAULT_RATING
+        if others:
+            rating += TRANSFER_WEIGHT * (sum(others) / len(others) - DEFAULT_RATING)
+        return {"rating": rating, "answers": 0}
+
+    def record(self, user_id: str, topic: str, difficulty: int, score: float):
+        """Applies one scored answer and returns the updated estimate with the next difficulty."""
+        unavailable = self._load_users([user_id])
+        key = _topic_key(topic)
+        with self._lock:
+            entry = _updated(self._entry(user_id, key), difficulty, score)
+            if user_id in unavailable:
+                # Their stored history couldn't be read: answer from the defaults, but don't
+                # store this, or the next flush would overwrite the real ratings with it
+                self._stats["skipped_updates"] += 1
+            else:
+                self._users.setdefault(user_id, {})[key] = entry
+                self._dirty.add((user_id, key))
+                self._stats["updates"] += 1
+        return _describe(topic, entry)
+
+    def preview(self, user_id: str, topic: str, difficulty: int, score: float):
+        """The next difficulty record() would return for this score, without storing anything."""
+        self._load_users([user_id])
+        with self._lock:
+            entry = _updated(self._entry(user_id, _topic_key(topic)), difficulty, score)
+        return difficulty_for(entry["rating"])
+
+    def candidate_difficulties(self, user_id: str, topic: str, difficulty: int):
+        """Every level record() can return after an answer at this difficulty (worst to best score)."""
+        low = self.preview(user_id, topic, difficulty, 0)
+        high = self.preview(user_id, topic, difficulty, 100)
+        return list(range(low, high + 1))
+
+    def estimates(self, pairs: list):
+        """Batch lookup: [(user_id, topic), ...] -> current estimate and next difficulty for each."""
+        self._load_users([user_id for user_id, _ in pairs])
+        with self._lock:
+            return [_describe(topic, self._entry(user_id, _topic_key(topic))) for user_id, topic in pairs]
+
+    def starting_difficulty(self, user_id: str, topics: list):
+        """Per-topic starting levels for a new session, plus one overall level for mixed-topic generation."""
+        per_topic = {e["topic"]: e["next_difficulty"] for e in self.estimates([(user_id, t) for t in topics or ["General"]])}
+        overall = int(round(sum(per_topic.values()) / len(per_topic)))
+        return per_topic, overall
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self._stats,
+                "users": len(self._users),
+                "dirty": len(self._dirty),
+                "persistent": bool(self.database_url),
+            }
+
+    # ---- history
+
+    def rebuild_from_history(self, batch_size: int = 5000):
+        """
+        Recomputes every rating by replaying ai_scores in order and replaces skill_ratings.
+        Voice answers are skipped: their ai_scores rows hold placeholder zeros.
+        """
+        if not self.database_url:
+            raise RuntimeError("DATABASE_URL is not set")
+        import psycopg2
+        ratings = {}
+        conn = psycopg2.connect(self.database_url)
+        try:
+            # Named cursor: rows are streamed from the server in batches
+            with conn.cursor(name="adaptive_replay") as cur:
+                cur.itersize = batch_size
+                cur.execute("""
+                    SELECT s.user_id::text, q.topic, q.difficulty_level, sc.final_score
+                    FROM ai_scores sc
+                    JOIN answers a ON a.id = sc.answer_id
+                    JOIN questions q ON q.id = a.question_id
+                    JOIN interview_sessions s ON s.id = a.session_id
+                    WHERE sc.final_score IS NOT NULL
+                      AND COALESCE(TRIM(a.answer_text), '') <> ''
+                    ORDER BY sc.created_at
+                """)
+                for user_id, topic, difficulty, score in cur:
+                    key = _topic_key(topic)
+                    user = ratings.setdefault(user_id, {})
+                    if key not in user:
+                        others = [e["rating"] for e in user.values()]
+                        start = DEFAULT_RATING + (TRANSFER_WEIGHT * (sum(others) / len(others) - DEFAULT_RATING) if others else 0)
+                        user[key] = {"rating": start, "answers": 0}
+                    user[key] = _updated(user[key], int(difficulty or 3), float(score))
+            rows = [(u, t, e["rating"], e["answers"]) for u, topics in ratings.items() for t, e in topics.items()]
+            with conn.cursor() as cur:
+                cur.execute("DELETE FROM skill_ratings")
+                cur.executemany(
+                    "INSERT INTO skill_ratings (user_id, topic, rating, answers, updated_at) VALUES (%s, %s, %s, %s, NOW())",
+                    rows,
+                )
+            conn.commit()
+        finally:
+            conn.close()
+        with self._lock:
+            self._users.clear()
+            self._dirty.clear()
+        return len(rows)
+
+
+def _storage_url():
+    if not DATABASE_URL:
+        return None
+    try:
+        import psycopg2  # noqa: F401
+    except ImportError:
+        print("psycopg2 is not installed; adaptive skill ratings are kept in memory only")
+        return None
+    return DATABASE_URL
+
+
+ability_store = AbilityStore(_storage_url())
+_flusher = None
+
+
+async def _flush_loop():
+    while True:
+        await asyncio.sleep(ADAPTIVE_FLUSH_SECONDS)
+        await run_in_threadpool(ability_store.flush)
+
+
+def start_flusher():
+    global _flusher
+    if _flusher is None and ability_store.database_url:
+        _flusher = asyncio.get_running_loop().create_task(_flush_loop())
+
+
+async def stop_flusher():
+    global _flusher
+    if _flusher is not None:
+        _flusher.cancel()
+        _flusher = None
+    # Last write-behind before the process exits
+    await run_in_threadpool(ability_store.flush)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Adaptive difficulty maintenance")
+    parser.add_argument("--rebuild", action="store_true", help="recompute skill_ratings from the full ai_scores history")
+    args = parser.parse_args()
+    if args.rebuild:
+        started = time.perf_counter()
+        count = ability_store.rebuild_from_history()
+        print(f"Rebuilt {count} skill ratings in {time.perf_counter() - started:.1f}s")
+    else:
+        parser.print_help()
@@ -1,7 +1,9 @@
-import wave
 import json
 import os
-import sys
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 # Add FFmpeg to PATH before importing pydub (Windows compatibility)
 if os.name == 'nt':  # Windows
@@ -17,9 +19,10 @@ if os.name == 'nt':  # Windows
 import vosk
 import librosa
 import numpy as np
-import io
 from pydub import AudioSegment
 from pydub.utils import which
+from app.services.pitch import pitch_values, PITCH_ENGINE
+from app.services.model_registry import register, get_model
 
 # Configure FFmpeg path for pydub (Windows compatibility)
 if os.name == 'nt':  # Windows
@@ -57,43 +60,206 @@ if os.name == 'nt':  # Windows
 
 
 
-# Initialize Vosk Model
+# Vosk Model, loaded on first use (or at startup with WARMUP=vosk)
 # In a real deployment, ensure the model is downloaded to 'model' directory.
 MODEL_PATH = "model" 
-if not os.path.exists(MODEL_PATH):
-    print(f"WARNING: Vosk model not found at '{MODEL_PATH}'. Audio transcription will fail.")
-    model = None
-else:
+
+
+def _load_vosk_model():
+    if not os.path.exists(MODEL_PATH):
+        print(f"WARNING: Vosk model not found at '{MODEL_PATH}'. Audio transcription will fail.")
+        return None
     vosk.SetLogLevel(-1)
-    model = vosk.Model(MODEL_PATH)
+    return vosk.Model(MODEL_PATH)
+
+
+register("vosk", _load_vosk_model)
+
+
+def get_vosk_model():
+    return get_model("vosk")
+
+# Vosk expects mono 16-bit PCM; 16kHz is what the bundled model was trained on
+SAMPLE_RATE = 16000
+
+# Samples handed to Vosk per AcceptWaveform call (16000 = 1s); larger chunks mean fewer Python <-> Kaldi round trips
+VOSK_CHUNK_FRAMES = int(os.environ.get("VOSK_CHUNK_FRAMES", "16000"))
+# Background threads for VOSK_THREADED recognition, per process
+VOSK_THREADS = int(os.environ.get("VOSK_THREADS", "4"))
+# Run the Vosk loop on a background thread while the acoustic features are computed;
+# AcceptWaveform is a cffi call, so Kaldi decodes without holding the GIL
+VOSK_THREADED = os.environ.get("VOSK_THREADED", "0") == "1"
+# Voice activity gate: frames this many dB below the loudest frame are silence,
+# and voiced segments keep this much context (seconds) on each side for the recognizer
+VAD_TOP_DB = float(os.environ.get("VAD_TOP_DB", "20"))
+VAD_PADDING = float(os.environ.get("VAD_PADDING", "0.2"))
+# Absolute floor (-60 dBFS RMS) so an all-quiet recording is silence rather than "loudest frame" speech
+VAD_MIN_RMS = 1e-3
+# Bump whenever a change here alters the metrics, so cached analyses of the old version are not reused
+ANALYSIS_VERSION = "3"
+
+
+def analysis_settings():
+    """Everything besides the audio bytes that changes analyze_audio_file's output (part of its cache key)."""
+    return [ANALYSIS_VERSION, MODEL_PATH, VAD_TOP_DB, VAD_PADDING, PITCH_ENGINE]
+
+_asr_lock = threading.Lock()
+_asr_thread = None
+
+
+def new_recognizer():
+    """
+    A KaldiRecognizer with word timestamps on, or None without a model.
+    One per answer: Reset() doesn't rewind a recognizer's clock, so a reused one
+    reports word times offset by everything it decoded before, which skews wpm.
+    The heavy part is the model, which stays loaded and shared.
+    """
+    model = get_vosk_model()
+    if model is None:
+        return None
+    rec = vosk.KaldiRecognizer(model, SAMPLE_RATE)
+    rec.SetWords(True)
+    return rec
+
+
+def transcribe_pcm(pcm: bytes):
+    """
+    Runs PCM through a fresh recognizer, so word times start at 0.
+    Returns (transcript, words), words being Vosk's [{"word", "start", "end", "conf"}] in seconds.
+    """
+    rec = new_recognizer()
+    if rec is None:
+        return "", []
+    texts = []
+    words = []
+
+    def collect(raw):
+        part = json.loads(raw)
+        if part.get("text"):
+            texts.append(part["text"])
+        words.extend(part.get("result", []))
+
+    chunk_bytes = VOSK_CHUNK_FRAMES * 2  # 16-bit samples
+    for offset in range(0, len(pcm), chunk_bytes):
+        # Result() is only parsed at utterance boundaries
+        if rec.AcceptWaveform(pcm[offset:offset + chunk_bytes]):
+            collect(rec.Result())
+    collect(rec.FinalResult())
+    return " ".join(texts), words
+
+
+def _asr_executor():
+    global _asr_thread
+    with _asr_lock:
+        if _asr_thread is None:
+            _asr_thread = ThreadPoolExecutor(max_workers=VOSK_THREADS, thread_name_prefix="vosk")
+    return _asr_thread
+
+
+def voice_segments(y: np.ndarray, sr: int, ref_rms: float = 0.0):
+    """
+    VAD pre-stage. Returns (intervals, segments): the non-silent intervals, and the
+    same intervals padded by VAD_PADDING and merged where they touch, as [start, end]
+    sample indices into y. ref_rms raises the reference level above y's own loudest
+    frame (the streaming analyzer passes the loudest frame heard so far).
+    """
+    intervals = librosa.effects.split(y, top_db=VAD_TOP_DB, ref=lambda rms: max(float(np.max(rms)), ref_rms, VAD_MIN_RMS))
+    pad = int(VAD_PADDING * sr)
+    segments = []
+    for start, end in intervals:
+        start, end = max(0, int(start) - pad), min(len(y), int(end) + pad)
+        if segments and start <= segments[-1][1]:
+            segments[-1][1] = max(segments[-1][1], end)
+        else:
+            segments.append([start, end])
+    return intervals, segments
 
-def convert_to_wav(audio_source):
+
+def join_segments(y: np.ndarray, intervals: np.ndarray, segments: list):
+    """
+    The voiced audio as one array, plus the unpadded intervals shifted onto it (for
+    the pitch engines) and offsets[i] = where segment i starts in it.
+    """
+    offsets = np.cumsum([0] + [end - start for start, end in segments[:-1]])
+    voiced_y = np.concatenate([y[start:end] for start, end in segments])
+    seg_starts = np.array([start for start, _ in segments])
+    owner = np.searchsorted(seg_starts, intervals[:, 0], side="right") - 1
+    voiced_intervals = intervals + (offsets[owner] - seg_starts[owner])[:, None]
+    return voiced_y, voiced_intervals, offsets
+
+
+def _to_original(sample: float, segments: list, offsets: np.ndarray):
+    # Position in the concatenated voiced audio -> position in the recording
+    i = max(0, int(np.searchsorted(offsets, sample, side="right")) - 1)
+    return segments[i][0] + (sample - offsets[i])
+
+
+def speaking_rate(words: list, sr: int, segments: list, offsets: np.ndarray):
+    """Words per minute between the first and last word, with timestamps mapped back onto the recording."""
+    first = _to_original(words[0]["start"] * sr, segments, offsets)
+    last = _to_original(words[-1]["end"] * sr, segments, offsets)
+    speaking = (last - first) / sr
+    return round(len(words) / speaking * 60) if speaking > 0 else 0
+
+
+FILLER_WORDS = ["um", "uh", "like", "you know", "sort of"]
+
+def count_fillers(transcript: str):
+    # Filler Words (Simple keyword match)
+    text = transcript.lower()
+    return sum(text.count(f) for f in FILLER_WORDS)
+
+def apply_scores(results: dict, duration: float):
+    """
+    Fills in fluency_score and confidence_score (0-10) from the raw metrics.
+    Shared by the batch analyzer and the streaming analyzer.
+    """
+    # Fluency Score:
+    # Base 10. Penalize for low WPM (<100) or high WPM (>160). Penalize for fillers.
+    fluency = 10
+    if results["wpm"] < 100: fluency -= 2
+    if results["wpm"] > 160: fluency -= 1
+    fluency -= (results["filler_words"] * 0.5)
+    results["fluency_score"] = max(0, min(10, round(fluency, 1)))
+
+    # Confidence Score:
+    # Base 10. Penalize for too much silence (>20% of time). Penalize for low volume consistency.
+    confidence = 10
+    silence_ratio = results["pause_duration"] / duration if duration > 0 else 0
+    if silence_ratio > 0.2: confidence -= (silence_ratio * 10) # Heavy penalty for silence
+    if results["volume_consistency"] < 0.8: confidence -= 1
+    if results["wpm"] < 80: confidence -= 2
+    results["confidence_score"] = max(0, min(10, round(confidence, 1)))
+
+def ffmpeg_command(input_arg: str = "pipe:0"):
     """
-    Converts audio from various formats (WebM, MP3, etc.) to WAV format in memory.
-    Returns a BytesIO object containing WAV data.
+    ffmpeg invocation that decodes any supported container to raw mono s16le
+    at SAMPLE_RATE on stdout. Uses the binary pydub was configured with.
+    """
+    return [
+        AudioSegment.converter, "-hide_banner", "-loglevel", "error",
+        "-i", input_arg,
+        "-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE),
+        "pipe:1",
+    ]
+
+def decode_audio(audio_source):
+    """
+    Decodes audio from various formats (WebM, MP3, WAV, etc.) in a single ffmpeg pass.
+    Returns raw mono 16-bit PCM at SAMPLE_RATE as bytes, or None on failure.
     """
     try:
-        # If it's a file path
         if isinstance(audio_source, str):
-            audio = AudioSegment.from_file(audio_source)
+            # ffmpeg reads the path itself, nothing is buffered on our side
+            proc = subprocess.run(ffmpeg_command(audio_source), capture_output=True)
         else:
-            # If it's a file-like object, read it
             audio_source.seek(0)
-            audio_bytes = audio_source.read()
-            audio = AudioSegment.from_file(io.BytesIO(audio_bytes))
-        
-        # Convert to WAV format: mono, 16-bit, 16kHz (good for speech recognition)
-        audio = audio.set_channels(1)
-        audio = audio.set_frame_rate(16000)
-        audio = audio.set_sample_width(2)  # 16-bit
-        
-        # Export to BytesIO as WAV
-        wav_io = io.BytesIO()
-        audio.export(wav_io, format='wav')
-        wav_io.seek(0)
-        return wav_io
+            proc = subprocess.run(ffmpeg_command(), input=audio_source.read(), capture_output=True)
+        if proc.returncode != 0:
+            raise RuntimeError(proc.stderr.decode(errors="ignore").strip() or f"ffmpeg exited with {proc.returncode}")
+        return proc.stdout
     except Exception as e:
-        print(f"Error converting audio to WAV: {e}")
+        print(f"Error decoding audio: {e}")
         return None
 
 def analyze_audio_file(audio_source):
@@ -109,104 +275,94 @@ def analyze_audio_file(audio_source):
         "pitch_variance": 0,
         "volume_consistency": 0,
         "fluency_score": 0,
-        "confidence_score": 0
+        "confidence_score": 0,
+        "timings": {}
     }
+    timings = results["timings"]
 
-    # Convert audio to WAV format first
-    wav_source = convert_to_wav(audio_source)
-    if not wav_source:
-        print("Failed to convert audio to WAV format")
+    # Decode once; Vosk and librosa both work off this one PCM buffer
+    stage_start = time.perf_counter()
+    pcm = decode_audio(audio_source)
+    timings["decode_ms"] = round((time.perf_counter() - stage_start) * 1000, 1)
+    if not pcm:
+        print("Failed to decode audio")
+        results["error"] = "Could not decode audio"
         return results
+    # Zero-copy int16 view over the decoded bytes
+    samples = np.frombuffer(pcm, dtype=np.int16)
+    results["duration_seconds"] = round(len(samples) / SAMPLE_RATE, 2)
 
-    # 1. Transcription with Vosk
-    if model:
-        try:
-            wav_source.seek(0)
-            wf = wave.open(wav_source, "rb")
-        except (wave.Error, EOFError) as e:
-            print(f"Wave open failed after conversion: {e}")
-            wf = None
-            
-        if wf and (wf.getnchannels() != 1 or wf.getsampwidth() != 2 or wf.getcomptype() != "NONE"):
-            # Handle format mismatch
-            pass # VOSK might fail or warn
-        
-        if wf:
-            rec = vosk.KaldiRecognizer(model, wf.getframerate())
-            rec.SetWords(True)
-    
-            transcript_parts = []
-            while True:
-                data = wf.readframes(4000)
-                if len(data) == 0:
-                    break
-                if rec.AcceptWaveform(data):
-                    part = json.loads(rec.Result())
-                    transcript_parts.append(part.get("text", ""))
-            
-            final_part = json.loads(rec.FinalResult())
-            transcript_parts.append(final_part.get("text", ""))
-            results["transcript"] = " ".join([t for t in transcript_parts if t])
-            # wf.close() # Don't close if it's a file-like object we need later? 
-            # wave.open(file_object) does not close file object on close().
-            wf.close() 
-
-    # 2. Acoustic Analysis with Librosa
+    asr = None
     try:
-        wav_source.seek(0)
-        y, sr = librosa.load(wav_source, sr=None)
-        duration = librosa.get_duration(y=y, sr=sr)
-        
-        # Audio feature extraction
-        rms = librosa.feature.rms(y=y)[0]
-        pitches, magnitudes = librosa.piptrack(y=y, sr=sr)
-        
-        # Silence Detection
-        non_silent_intervals = librosa.effects.split(y, top_db=20)
-        non_silent_duration = sum(end - start for start, end in non_silent_intervals) / sr
-        results["pause_duration"] = round(duration - non_silent_duration, 2)
-        
-        # Pitch Variance (Standard Deviation of pitch)
-        # Filter out zero pitches (unvoiced)
-        pitch_values = pitches[pitches > 0]
-        if len(pitch_values) > 0:
-            results["pitch_variance"] = round(float(np.std(pitch_values)), 2)
-            
+        # Already at SAMPLE_RATE, so no reload or resample; just scale to float32 [-1, 1]
+        sr = SAMPLE_RATE
+        # Scale in place: dividing into a new array would hold a second full-size float copy
+        y = samples.astype(np.float32)
+        y /= 32768.0
+        duration = len(y) / sr
+
+        # 1. Voice activity detection, once, up front. The same intervals give
+        # pause_duration, and only the (padded) voiced audio goes any further.
+        stage_start = time.perf_counter()
+        intervals, segments = voice_segments(y, sr)
+        non_silent_duration = sum(end - start for start, end in intervals) / sr
+        results["pause_duration"] = round(float(duration - non_silent_duration), 2)
+        timings["vad_ms"] = round((time.perf_counter() - stage_start) * 1000, 1)
+        if not segments:
+            apply_scores(results, duration)
+            return results
+
+        voiced_y, voiced_intervals, offsets = join_segments(y, intervals, segments)
+        voiced_pcm = b"".join(pcm[start * 2:end * 2] for start, end in segments)
+
+        # 2. Transcription with Vosk (optionally on a background thread, see VOSK_THREADED)
+        stage_start = time.perf_counter()
+        asr = _asr_executor().submit(transcribe_pcm, voiced_pcm) if VOSK_THREADED else None
+        if asr is None:
+            results["transcript"], words = transcribe_pcm(voiced_pcm)
+            timings["transcribe_ms"] = round((time.perf_counter() - stage_start) * 1000, 1)
+
+        # 3. Acoustic features on the voiced audio only
+        acoustic_start = time.perf_counter()
+        feature_start = time.perf_counter()
+        rms = librosa.feature.rms(y=voiced_y)[0]
+        timings["rms_ms"] = round((time.perf_counter() - feature_start) * 1000, 1)
+
         # Volume Consistency (Inverse of RMS Standard Deviation)
         # Lower std dev means more consistent volume. 
         # We normalize specific to typical speech range.
         results["volume_consistency"] = round(1.0 - float(np.std(rms)), 2) 
 
-        # 3. Derived Metrics
-        word_count = len(results["transcript"].split())
-        results["wpm"] = round((word_count / duration) * 60) if duration > 0 else 0
-        
-        # Filler Words (Simple keyword match)
-        fillers = ["um", "uh", "like", "you know", "sort of"]
-        filler_count = sum(results["transcript"].lower().count(f) for f in fillers)
-        results["filler_words"] = filler_count
-
-        # 4. Scoring Logic (0-10)
-        
-        # Fluency Score:
-        # Base 10. Penalize for low WPM (<100) or high WPM (>160). Penalize for fillers.
-        fluency = 10
-        if results["wpm"] < 100: fluency -= 2
-        if results["wpm"] > 160: fluency -= 1
-        fluency -= (filler_count * 0.5)
-        results["fluency_score"] = max(0, min(10, round(fluency, 1)))
-        
-        # Confidence Score:
-        # Base 10. Penalize for too much silence (>20% of time). Penalize for low volume consistency.
-        confidence = 10
-        silence_ratio = results["pause_duration"] / duration if duration > 0 else 0
-        if silence_ratio > 0.2: confidence -= (silence_ratio * 10) # Heavy penalty for silence
-        if results["volume_consistency"] < 0.8: confidence -= 1
-        if results["wpm"] < 80: confidence -= 2
-        results["confidence_score"] = max(0, min(10, round(confidence, 1)))
+        # Pitch Variance (Standard Deviation of pitch)
+        # Engine is picked by PITCH_ENGINE; unvoiced frames are already filtered out
+        feature_start = time.perf_counter()
+        voiced_pitches = pitch_values(voiced_y, sr, voiced_intervals)
+        timings["pitch_ms"] = round((time.perf_counter() - feature_start) * 1000, 1)
+        if len(voiced_pitches) > 0:
+            results["pitch_variance"] = round(float(np.std(voiced_pitches)), 2)
+        timings["acoustic_ms"] = round((time.perf_counter() - acoustic_start) * 1000, 1)
+
+        if asr is not None:
+            results["transcript"], words = asr.result()
+            timings["transcribe_ms"] = round((time.perf_counter() - stage_start) * 1000, 1)
+
+        # 4. Derived Metrics
+        # Speaking rate from the word timestamps, mapped back onto the original recording
+        results["wpm"] = speaking_rate(words, sr, segments, offsets) if words else 0
+        results["filler_words"] = count_fillers(results["transcript"])
+
+        # 5. Scoring Logic (0-10)
+        apply_scores(results, duration)
 
     except Exception as e:
         print(f"Error in acoustic analysis: {e}")
         # Fallback if librosa fails (e.g., file codec issues)
+        results["error"] = f"Acoustic analysis failed: {e}"
+        # The threaded transcription may still have finished; keep what it heard
+        if asr is not None and not results["transcript"]:
+            try:
+                results["transcript"], _ = asr.result()
+            except Exception:
+                pass
 
     return results
@@ -0,0 +1,191 @@
+import asyncio
+import hashlib
+import io
+import math
+import multiprocessing
+import os
+import time
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from app.services.cache import ResultCache, make_key
+
+# Worker tier for the audio pipeline.
+# ffmpeg decoding, the Vosk loop and librosa are all CPU bound, so they run in
+# separate processes instead of on the event loop. Set AUDIO_WORKERS=0 to run
+# the analysis in the default threadpool of the API process instead.
+AUDIO_WORKERS = int(os.environ.get("AUDIO_WORKERS", "2"))
+# How many requests may wait for a free worker before we start returning 429s
+AUDIO_QUEUE_DEPTH = int(os.environ.get("AUDIO_QUEUE_DEPTH", "8"))
+
+# Clients retry uploads, so results are cached by a hash of the audio bytes
+audio_cache = ResultCache(
+    "analyze_audio",
+    max_entries=int(os.environ.get("AUDIO_CACHE_SIZE", "256")),
+    db_path=os.environ.get("AUDIO_CACHE_DB") or None,
+    ttl_seconds=float(os.environ.get("AUDIO_CACHE_TTL", str(7 * 24 * 3600))),
+)
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = 0
+# cache key -> task of the analysis running for it, so identical concurrent uploads share one run
+_inflight = {}
+# Moving average of how long one analysis takes, used for Retry-After hints
+_avg_job_seconds = 5.0
+
+
+class PoolBusyError(Exception):
+    """Raised when every worker is busy and the wait queue is full."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Audio workers are saturated, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class PoolBrokenError(Exception):
+    """Raised when a worker died mid-analysis; the pool has been rebuilt for the next request."""
+
+
+def _init_worker():
+    # Workers exist only to run audio, so they load the Vosk model up front, once per process.
+    # A failure here must not raise: that would break the whole executor, so log it and carry on
+    try:
+        from app.services.audio_analyzer import get_vosk_model
+        get_vosk_model()
+    except Exception as e:
+        print(f"Audio worker could not load the Vosk model: {e}")
+
+
+def _run_analysis(audio_bytes: bytes, submitted_at: float):
+    from app.services.audio_analyzer import analyze_audio_file
+
+    queue_wait = time.time() - submitted_at
+    results = analyze_audio_file(io.BytesIO(audio_bytes))
+    results.setdefault("timings", {})["queue_wait_ms"] = round(queue_wait * 1000, 1)
+    return results
+
+
+def start_pool():
+    global _executor
+    with _executor_lock:
+        if _executor is not None or AUDIO_WORKERS <= 0:
+            return
+        # spawn keeps Kaldi/ffmpeg state out of the forked API process and matches Windows
+        ctx = multiprocessing.get_context("spawn")
+        _executor = ProcessPoolExecutor(
+            max_workers=AUDIO_WORKERS,
+            mp_context=ctx,
+            initializer=_init_worker,
+        )
+    print(f"Audio worker pool started with {AUDIO_WORKERS} processes")
+
+
+def _restart_pool(broken):
+    """Replaces a broken executor (a worker was OOM-killed or Kaldi aborted); once, however many requests saw it."""
+    global _executor
+    with _executor_lock:
+        if _executor is not broken:
+            return
+        _executor = None
+        broken.shutdown(wait=False, cancel_futures=True)
+    print("Audio worker pool broke, restarting it")
+    start_pool()
+
+
+def shutdown_pool():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _retry_after_seconds():
+    workers = max(AUDIO_WORKERS, 1)
+    backlog = max(_pending - workers + 1, 1)
+    return max(1, math.ceil(_avg_job_seconds * backlog / workers))
+
+
+def pool_status():
+    return {
+        "workers": AUDIO_WORKERS,
+        "queue_depth": AUDIO_QUEUE_DEPTH,
+        "pending": _pending,
+        "avg_job_seconds": round(_avg_job_seconds, 2),
+    }
+
+
+def audio_cache_key(audio_bytes: bytes):
+    from app.services.audio_analyzer import analysis_settings
+    return make_key("analyze_audio", analysis_settings(), hashlib.sha256(audio_bytes).hexdigest())
+
+
+async def analyze_audio_bytes(audio_bytes: bytes):
+    """
+    analyze_audio_file for an upload, served from audio_cache when these exact
+    bytes were analyzed before. Identical uploads arriving while one is being
+    analyzed wait for that run instead of starting their own.
+    Raises PoolBusyError when the pool and its wait queue are full, and
+    PoolBrokenError when a worker died while analyzing.
+    """
+    key = audio_cache_key(audio_bytes)
+    cached = audio_cache.get(key)
+    if cached is not None:
+        return {**cached, "cached": True}
+
+    task = _inflight.get(key)
+    leader = task is None
+    if leader:
+        task = asyncio.ensure_future(_analyze_and_store(key, audio_bytes))
+        _inflight[key] = task
+        task.add_done_callback(lambda done: _finished(key, done))
+    else:
+        audio_cache.record_coalesced()
+    # Shielded: one client disconnecting must not cancel the run the others are waiting on
+    results = await asyncio.shield(task)
+    return dict(results) if leader else {**results, "coalesced": True}
+
+
+def _finished(key: str, task):
+    _inflight.pop(key, None)
+    # Mark the error as seen even if every waiter went away before it was raised
+    if not task.cancelled():
+        task.exception()
+
+
+async def _analyze_and_store(key: str, audio_bytes: bytes):
+    results = await _analyze(audio_bytes)
+    if "error" not in results:
+        audio_cache.record_compute(results["timings"]["total_ms"] / 1000)
+        audio_cache.set(key, results)
+    return results
+
+
+async def _analyze(audio_bytes: bytes):
+    """Runs analyze_audio_file off the event loop."""
+    global _pending, _avg_job_seconds
+
+    capacity = max(AUDIO_WORKERS, 1) + AUDIO_QUEUE_DEPTH
+    if _pending >= capacity:
+        raise PoolBusyError(_retry_after_seconds())
+
+    if _executor is None and AUDIO_WORKERS > 0:
+        start_pool()
+
+    _pending += 1
+    started = time.perf_counter()
+    executor = _executor
+    try:
+        loop = asyncio.get_running_loop()
+        # executor is None in inline mode, which means the default threadpool
+        results = await loop.run_in_executor(executor, _run_analysis, audio_bytes, time.time())
+    except BrokenProcessPool as e:
+        _restart_pool(executor)
+        raise PoolBrokenError(f"Audio worker crashed, please retry: {e}")
+    finally:
+        _pending -= 1
+
+    elapsed = time.perf_counter() - started
+    _avg_job_seconds = 0.8 * _avg_job_seconds + 0.2 * elapsed
+    results["timings"]["total_ms"] = round(elapsed * 1000, 1)
+    return results
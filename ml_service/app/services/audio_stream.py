@@ -0,0 +1,299 @@
+import json
+import os
+import queue
+import subprocess
+import threading
+import time
+
+import numpy as np
+
+from app.services import audio_analyzer
+from app.services.audio_analyzer import (
+    SAMPLE_RATE, VAD_TOP_DB, VAD_PADDING, VAD_MIN_RMS, count_fillers, apply_scores, ffmpeg_command, voice_segments, join_segments,
+)
+from app.services.pitch import pitch_values
+
+# Live analysis of an answer while it is being recorded.
+# Chunks are decoded by one long-running ffmpeg process per stream (or taken as
+# raw s16le PCM), pushed straight into a persistent KaldiRecognizer, and the
+# acoustic counters are updated per chunk so finishing only flushes the tail.
+
+# Upper bound on simultaneous streams; each one holds an ffmpeg process and a recognizer
+MAX_AUDIO_STREAMS = int(os.environ.get("MAX_AUDIO_STREAMS", "8"))
+
+# Same framing librosa.feature.rms / effects.split use by default
+FRAME_LENGTH = 2048
+HOP_LENGTH = 512
+# Same silence rule as the batch VAD: a frame is silent when its RMS is VAD_TOP_DB below the loudest frame
+SILENCE_RATIO = 10 ** (-VAD_TOP_DB / 20)
+# Pitch is tracked on blocks of this many samples as they arrive
+PITCH_BLOCK = SAMPLE_RATE
+
+_active_streams = 0
+# open_stream runs in the threadpool, so the counter needs a lock
+_streams_lock = threading.Lock()
+
+
+class TooManyStreamsError(Exception):
+    pass
+
+
+class _RunningStats:
+    """Mean/variance accumulator that merges whole batches (Chan et al.)."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, values: np.ndarray):
+        n = len(values)
+        if n == 0:
+            return
+        batch_mean = float(np.mean(values))
+        batch_m2 = float(np.sum((values - batch_mean) ** 2))
+        total = self.count + n
+        delta = batch_mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += batch_m2 + delta * delta * self.count * n / total
+        self.count = total
+
+    @property
+    def std(self):
+        return (self.m2 / self.count) ** 0.5 if self.count else 0.0
+
+
+class _FfmpegDecoder:
+    """Feeds container bytes (WebM/Ogg/...) into ffmpeg and collects PCM as it comes out."""
+
+    def __init__(self):
+        self.proc = subprocess.Popen(
+            ffmpeg_command(),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        self.output = queue.Queue()
+        self.reader = threading.Thread(target=self._read_stdout, daemon=True)
+        self.reader.start()
+
+    def _read_stdout(self):
+        fd = self.proc.stdout.fileno()
+        while True:
+            data = os.read(fd, 65536)
+            if not data:
+                break
+            self.output.put(data)
+        self.output.put(None)
+
+    def _drain(self):
+        chunks = []
+        while True:
+            try:
+                data = self.output.get_nowait()
+            except queue.Empty:
+                break
+            if data is None:
+                break
+            chunks.append(data)
+        return b"".join(chunks)
+
+    def write(self, chunk: bytes):
+        self.proc.stdin.write(chunk)
+        self.proc.stdin.flush()
+        return self._drain()
+
+    def close(self):
+        try:
+            self.proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        self.reader.join()
+        self.proc.wait()
+        return self._drain()
+
+    def kill(self):
+        if self.proc.poll() is None:
+            self.proc.kill()
+
+
+class StreamingAnalyzer:
+    """
+    Incremental counterpart of analyze_audio_file.
+    feed() takes the next chunk and returns the running metrics,
+    finish() returns a result with the same fields as the batch analyzer.
+    """
+
+    def __init__(self, input_format: str = "webm"):
+        self.decoder = None if input_format == "pcm" else _FfmpegDecoder()
+        # Its own recognizer, so word times are relative to the start of this answer
+        self.rec = audio_analyzer.new_recognizer()
+
+        self.transcript_parts = []
+        self.partial_text = ""
+        self.word_count = 0
+        # Span from the first word's start to the last word's end, in seconds (for wpm, as in the batch analyzer)
+        self.first_word_start = None
+        self.last_word_end = None
+        self.filler_count = 0
+        self.total_samples = 0
+
+        self._odd_byte = b""
+        self._frame_tail = np.zeros(0, dtype=np.float32)
+        self._frame_rms = []
+        self._max_rms = 0.0
+        self._pitch_block = np.zeros(0, dtype=np.float32)
+        self._pitch_stats = _RunningStats()
+
+    def _accept_text(self, raw_result: str):
+        result = json.loads(raw_result)
+        text = result.get("text", "")
+        if text:
+            self.transcript_parts.append(text)
+            self.filler_count += count_fillers(text)
+        words = result.get("result", [])
+        if words:
+            self.word_count += len(words)
+            if self.first_word_start is None:
+                self.first_word_start = words[0]["start"]
+            self.last_word_end = words[-1]["end"]
+
+    def _update_acoustics(self, y: np.ndarray):
+        # RMS frames, carrying the incomplete last frame over to the next chunk
+        buf = np.concatenate([self._frame_tail, y])
+        if len(buf) >= FRAME_LENGTH:
+            frames = np.lib.stride_tricks.sliding_window_view(buf, FRAME_LENGTH)[::HOP_LENGTH]
+            rms = np.sqrt(np.mean(frames ** 2, axis=1))
+            self._frame_rms.append(rms)
+            self._max_rms = max(self._max_rms, float(rms.max()))
+            consumed = len(frames) * HOP_LENGTH
+            self._frame_tail = buf[consumed:]
+        else:
+            self._frame_tail = buf
+
+        self._pitch_block = np.concatenate([self._pitch_block, y])
+        if len(self._pitch_block) >= PITCH_BLOCK:
+            self._track_pitch(self._pitch_block)
+            self._pitch_block = np.zeros(0, dtype=np.float32)
+
+    def _track_pitch(self, block: np.ndarray):
+        # Voiced parts only, as in the batch analyzer. The block is judged against the loudest
+        # frame so far rather than of the whole answer, which isn't known until finish()
+        if len(block) < FRAME_LENGTH:
+            return
+        intervals, segments = voice_segments(block, SAMPLE_RATE, ref_rms=self._max_rms)
+        if not segments:
+            return
+        voiced_y, voiced_intervals, _ = join_segments(block, intervals, segments)
+        self._pitch_stats.add(pitch_values(voiced_y, SAMPLE_RATE, voiced_intervals))
+
+    def _consume_pcm(self, pcm: bytes):
+        pcm = self._odd_byte + pcm
+        if len(pcm) % 2:
+            self._odd_byte, pcm = pcm[-1:], pcm[:-1]
+        else:
+            self._odd_byte = b""
+        if not pcm:
+            return
+
+        self.total_samples += len(pcm) // 2
+        if self.rec:
+            if self.rec.AcceptWaveform(pcm):
+                self._accept_text(self.rec.Result())
+                self.partial_text = ""
+            else:
+                self.partial_text = json.loads(self.rec.PartialResult()).get("partial", "")
+
+        y = np.frombuffer(pcm, dtype=np.int16).astype(np.float32)
+        y /= 32768.0
+        self._update_acoustics(y)
+
+    def _voiced_mask(self):
+        """Per RMS frame: voiced under the batch VAD rule, against the loudest frame of the answer so far."""
+        rms = np.concatenate(self._frame_rms) if self._frame_rms else np.zeros(0, dtype=np.float32)
+        return rms, rms >= max(self._max_rms, VAD_MIN_RMS) * SILENCE_RATIO
+
+    def _pause_duration(self):
+        if not self._frame_rms or self._max_rms == 0:
+            return 0.0
+        _, voiced = self._voiced_mask()
+        return int(np.count_nonzero(~voiced)) * HOP_LENGTH / SAMPLE_RATE
+
+    def _volume_consistency(self):
+        # Over the voiced frames plus VAD_PADDING around them, i.e. the audio the batch analyzer keeps
+        rms, voiced = self._voiced_mask()
+        if not voiced.any():
+            return 0
+        pad = int(VAD_PADDING * SAMPLE_RATE / HOP_LENGTH)
+        kept = np.convolve(voiced, np.ones(2 * pad + 1), mode="same") > 0
+        return round(1.0 - float(np.std(rms[kept])), 2)
+
+    def _wpm(self):
+        if self.first_word_start is None:
+            return 0
+        speaking = self.last_word_end - self.first_word_start
+        return round(self.word_count / speaking * 60) if speaking > 0 else 0
+
+    def _metrics(self):
+        duration = self.total_samples / SAMPLE_RATE
+        return {
+            "duration": round(duration, 2),
+            "wpm": self._wpm(),
+            "pause_duration": round(self._pause_duration(), 2),
+            "filler_words": self.filler_count,
+        }
+
+    def feed(self, chunk: bytes):
+        pcm = self.decoder.write(chunk) if self.decoder else chunk
+        self._consume_pcm(pcm)
+        partial = self._metrics()
+        partial["transcript"] = " ".join(self.transcript_parts + ([self.partial_text] if self.partial_text else []))
+        return partial
+
+    def finish(self):
+        stage_start = time.perf_counter()
+        if self.decoder:
+            self._consume_pcm(self.decoder.close())
+        if self.rec:
+            self._accept_text(self.rec.FinalResult())
+        self._track_pitch(self._pitch_block)
+
+        results = self._metrics()
+        duration = results.pop("duration")
+        results["transcript"] = " ".join(self.transcript_parts)
+        results["pitch_variance"] = round(self._pitch_stats.std, 2)
+        results["volume_consistency"] = self._volume_consistency()
+        apply_scores(results, duration)
+        results["timings"] = {"finalize_ms": round((time.perf_counter() - stage_start) * 1000, 1)}
+        return results
+
+    def abort(self):
+        if self.decoder:
+            self.decoder.kill()
+        self.rec = None
+
+
+def open_stream(input_format: str = "webm"):
+    """Starts ffmpeg and may load the Vosk model, so call it from the threadpool, not the event loop."""
+    global _active_streams
+    with _streams_lock:
+        if _active_streams >= MAX_AUDIO_STREAMS:
+            raise TooManyStreamsError(f"Too many active audio streams (limit {MAX_AUDIO_STREAMS})")
+        _active_streams += 1
+    try:
+        return StreamingAnalyzer(input_format)
+    except Exception:
+        with _streams_lock:
+            _active_streams -= 1
+        raise
+
+
+def close_stream(analyzer: StreamingAnalyzer):
+    global _active_streams
+    analyzer.abort()
+    with _streams_lock:
+        _active_streams -= 1
+
+
+def active_streams():
+    return _active_streams
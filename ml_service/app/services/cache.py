@@ -0,0 +1,122 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Content-addressed result caches shared by the services.
+# Each cache is an in-process LRU with an optional SQLite tier behind it;
+# values must be JSON serializable.
+
+_caches = []
+
+
+def make_key(*parts):
+    """Stable hash of the given (JSON serializable) parts."""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    def __init__(self, name: str, max_entries: int = 1024, db_path: str = None, ttl_seconds: float = None):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._counters = {"hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0, "coalesced": 0}
+        self._compute_seconds = 0.0
+        self._computes = 0
+
+        if db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+            )
+            self._db.commit()
+
+        _caches.append(self)
+
+    def _expiry(self):
+        return time.time() + self.ttl_seconds if self.ttl_seconds else None
+
+    def _remember(self, key, value, expires_at):
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > now:
+                    self._memory.move_to_end(key)
+                    self._counters["hits"] += 1
+                    return value
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    if row[1] is None or row[1] > now:
+                        value = json.loads(row[0])
+                        self._remember(key, value, row[1])
+                        self._counters["disk_hits"] += 1
+                        return value
+                    self._db.execute("DELETE FROM cache WHERE key = ?", (key,))
+                    self._db.commit()
+
+            self._counters["misses"] += 1
+            return None
+
+    def set(self, key: str, value):
+        expires_at = self._expiry()
+        with self._lock:
+            self._remember(key, value, expires_at)
+            self._counters["stores"] += 1
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), expires_at),
+                )
+                self._db.commit()
+
+    def record_compute(self, seconds: float):
+        """Time spent producing a value on a miss; used to estimate what hits save."""
+        with self._lock:
+            self._compute_seconds += seconds
+            self._computes += 1
+
+    def record_coalesced(self):
+        """A miss that waited for an identical computation already in flight instead of running its own."""
+        with self._lock:
+            self._counters["coalesced"] += 1
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            avg_compute = self._compute_seconds / self._computes if self._computes else 0.0
+            size = len(self._memory)
+        lookups = counters["hits"] + counters["disk_hits"] + counters["misses"]
+        served = counters["hits"] + counters["disk_hits"]
+        return {
+            **counters,
+            "size": size,
+            "max_entries": self.max_entries,
+            "persistent": self._db is not None,
+            "hit_rate": round(served / lookups, 3) if lookups else 0.0,
+            "avg_compute_seconds": round(avg_compute, 3),
+            "estimated_seconds_saved": round((served + counters["coalesced"]) * avg_compute, 1),
+        }
+
+
+def all_stats():
+    return {cache.name: cache.stats() for cache in _caches}
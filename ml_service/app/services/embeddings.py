@@ -0,0 +1,28 @@
+import os
+import numpy as np
+from app.services.model_registry import register, get_model
+
+# CPU sentence embeddings (sentence-transformers), loaded on first use
+EMBEDDING_MODEL = os.environ.get("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+
+
+def _load_embedding_model():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(EMBEDDING_MODEL, device="cpu")
+
+
+register("embeddings", _load_embedding_model)
+
+
+def get_embedding_model():
+    return get_model("embeddings")
+
+
+def embed(texts: list):
+    """L2-normalized float32 embeddings, one row per text, so dot product = cosine similarity."""
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+    vectors = get_embedding_model().encode(
+        texts, batch_size=32, convert_to_numpy=True, normalize_embeddings=True, show_progress_bar=False
+    )
+    return vectors.astype(np.float32)
@@ -1,62 +1,55 @@
-import os
+import re
 import json
-from groq import Groq
-from dotenv import load_dotenv
+from app.services.llm_gateway import chat_json, chat_stream
 
-load_dotenv()
+GENERATION_MODEL = "llama-3.3-70b-versatile"
 
-client = Groq(
-    api_key=os.environ.get("GROQ_API_KEY"),
-)
+_ARRAY_START = re.compile(r'"questions"\s*:\s*\[')
 
-# Debug: Check if API key is loaded
-if not os.environ.get("GROQ_API_KEY"):
-    print("WARNING: GROQ_API_KEY is not set in environment variables.")
-else:
-    print(f"GROQ_API_KEY loaded: {os.environ.get('GROQ_API_KEY')[:5]}...")
+def _messages(resume_text: str, topics: list, count: int, difficulty: int = None):
+    return [
+        {
+            "role": "system",
+            "content": """You are an expert technical interviewer. 
+            Generate technical interview questions based on the candidate's resume and selected topics.
+            
+            Return ONLY valid JSON in the following format:
+            {
+                "questions": [
+                    {
+                        "question_text": "...",
+                        "topic": "...",
+                        "difficulty_level": 1-5,
+                        "ideal_answer_keywords": ["..."],
+                        "ideal_answer_text": "..."
+                    }
+                ]
+            }
+            """
+        },
+        {
+            "role": "user",
+            "content": f"""
+            Resume Content: {resume_text[:2000]} (truncated)
+            
+            Selected Topics: {', '.join(topics)}
+            
+            Generate {count} distinct technical questions. 
+            Make sure they are relevant to the resume skills but focused on the selected topics.
+            {f"All questions must be at difficulty_level {difficulty}." if difficulty else ""}
+            """
+        }
+    ]
 
-def generate_interview_questions(resume_text: str, topics: list[str], count: int = 3):
+async def generate_interview_questions(resume_text: str, topics: list[str], count: int = 3, difficulty: int = None):
     print(f"Generating questions for topics: {topics}") # DEBUG
     try:
-        completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "system",
-                    "content": """You are an expert technical interviewer. 
-                    Generate technical interview questions based on the candidate's resume and selected topics.
-                    
-                    Return ONLY valid JSON in the following format:
-                    {
-                        "questions": [
-                            {
-                                "question_text": "...",
-                                "topic": "...",
-                                "difficulty_level": 1-5,
-                                "ideal_answer_keywords": ["..."],
-                                "ideal_answer_text": "..."
-                            }
-                        ]
-                    }
-                    """
-                },
-                {
-                    "role": "user",
-                    "content": f"""
-                    Resume Content: {resume_text[:2000]} (truncated)
-                    
-                    Selected Topics: {', '.join(topics)}
-                    
-                    Generate {count} distinct technical questions. 
-                    Make sure they are relevant to the resume skills but focused on the selected topics.
-                    """
-                }
-            ],
-            model="llama-3.3-70b-versatile",
+        result = await chat_json(
+            messages=_messages(resume_text, topics, count, difficulty),
+            model=GENERATION_MODEL,
             temperature=0.7,
-            response_format={"type": "json_object"}
         )
         
-        result = json.loads(completion.choices[0].message.content)
         questions = result.get("questions", [])
         print(f"Generated {len(questions)} questions.") # DEBUG
         return questions
@@ -64,3 +57,94 @@ def generate_interview_questions(resume_text: str, topics: list[str], count: int
     except Exception as e:
         print(f"Error generating questions: {e}")
         return [{"error": str(e)}]
+
+
+class QuestionStreamParser:
+    """
+    Incremental parser for {"questions": [{...}, {...}]} arriving in arbitrary
+    chunks. feed() returns the question objects completed by that chunk; each
+    character is scanned once, and consumed text is dropped.
+    """
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._in_array = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._object_start = None
+        self.done = False
+
+    def feed(self, text: str):
+        self._buffer += text
+        found = []
+        if not self._in_array:
+            match = _ARRAY_START.search(self._buffer)
+            if not match:
+                # Keep just enough of the tail for a key split across chunks
+                self._buffer = self._buffer[-32:]
+                return found
+            self._in_array = True
+            self._buffer = self._buffer[match.end():]
+            self._pos = 0
+
+        buffer = self._buffer
+        i = self._pos
+        while i < len(buffer) and not self.done:
+            char = buffer[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                if self._depth == 0:
+                    self._object_start = i
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        found.append(json.loads(buffer[self._object_start:i + 1]))
+                    except ValueError as e:
+                        print(f"Skipping malformed streamed question: {e}")
+                    self._object_start = None
+            elif char == "]" and self._depth == 0:
+                self.done = True
+            i += 1
+
+        # Drop everything before the object in progress
+        keep_from = self._object_start if self._object_start is not None else i
+        self._buffer = buffer[keep_from:]
+        self._pos = i - keep_from
+        if self._object_start is not None:
+            self._object_start = 0
+        return found
+
+
+async def stream_interview_questions(resume_text: str, topics: list[str], count: int = 3, difficulty: int = None):
+    """Same questions as generate_interview_questions, yielded one by one as soon as each is complete."""
+    print(f"Streaming questions for topics: {topics}") # DEBUG
+    parser = QuestionStreamParser()
+    yielded = 0
+    stream = chat_stream(
+        messages=_messages(resume_text, topics, count, difficulty),
+        model=GENERATION_MODEL,
+        temperature=0.7,
+    )
+    try:
+        async for text in stream:
+            for question in parser.feed(text):
+                if isinstance(question, dict) and question.get("question_text"):
+                    yielded += 1
+                    yield question
+            if parser.done:
+                break
+    finally:
+        # Stop the completion as soon as the array closes (or the consumer goes away)
+        await stream.aclose()
+    print(f"Streamed {yielded} questions.") # DEBUG
@@ -0,0 +1,239 @@
+import os
+import re
+import json
+import time
+import random
+import asyncio
+import inspect
+import httpx
+from groq import AsyncGroq, RateLimitError, APIStatusError, APITimeoutError, APIConnectionError
+from dotenv import load_dotenv
+from app.services.model_registry import register, get_model, unload
+from app.services.metrics import LLM_SECONDS, STAGE_SECONDS
+
+load_dotenv()
+
+# Single entry point for every Groq call made by the service.
+# One pooled async client, per-call timeouts, retries with exponential backoff,
+# and a token bucket fed by Groq's rate-limit headers so concurrent interviews
+# wait their turn instead of failing.
+
+LLM_TIMEOUT = float(os.environ.get("LLM_TIMEOUT", "30"))
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "4"))
+LLM_MAX_CONNECTIONS = int(os.environ.get("LLM_MAX_CONNECTIONS", "20"))
+# Request budget per minute; Groq's headers only report daily request and per-minute token quotas
+LLM_REQUESTS_PER_MINUTE = float(os.environ.get("LLM_REQUESTS_PER_MINUTE", "30"))
+
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 20.0
+
+_stats = {"requests": 0, "retries": 0, "rate_limited": 0, "failures": 0}
+
+
+def _parse_duration(value):
+    """Groq reset headers look like '7.66s', '2m59.56s' or '120ms'; Retry-After is plain seconds."""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    total = 0.0
+    matched = False
+    for amount, unit in re.findall(r"([\d.]+)(ms|h|m|s)", value):
+        matched = True
+        total += float(amount) * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[unit]
+    return total if matched else None
+
+
+class TokenBucket:
+    """
+    Request-rate limiter shared by all callers. Waiters are served in arrival
+    order (asyncio.Lock is FIFO), and the bucket can be drained or paused when
+    the API reports that we are over the limit.
+    """
+
+    def __init__(self, rate_per_minute: float):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(rate_per_minute, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return now
+
+    async def acquire(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                now = self._refill()
+                if self.blocked_until > now:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def update_from_headers(self, headers):
+        # Groq's *-requests headers count requests per day and *-tokens count tokens per
+        # minute, so neither is this bucket's per-minute request budget. They only
+        # pause it once a quota is used up; 429s and Retry-After cover the rest.
+        for quota in ("requests", "tokens"):
+            if headers.get(f"x-ratelimit-remaining-{quota}") == "0":
+                reset = _parse_duration(headers.get(f"x-ratelimit-reset-{quota}"))
+                if reset:
+                    self.pause(reset)
+
+
+_bucket = TokenBucket(LLM_REQUESTS_PER_MINUTE)
+
+
+def _build_client():
+    if not os.environ.get("GROQ_API_KEY"):
+        print("WARNING: GROQ_API_KEY is not set in environment variables.")
+    return AsyncGroq(
+        api_key=os.environ.get("GROQ_API_KEY"),
+        timeout=LLM_TIMEOUT,
+        # Retries are handled below so they go through the rate limiter
+        max_retries=0,
+        http_client=httpx.AsyncClient(
+            timeout=LLM_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_CONNECTIONS,
+            ),
+        ),
+    )
+
+
+register("groq", _build_client)
+
+
+def get_client():
+    return get_model("groq")
+
+
+async def close_client():
+    client = unload("groq")
+    if client is not None:
+        await client.close()
+
+
+def _backoff(attempt: int):
+    return min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)) * random.uniform(0.5, 1.0)
+
+
+async def chat_completion(timeout: float = None, **kwargs):
+    """
+    chat.completions.create through the shared client, rate limiter and retry policy.
+    Raises the last error once retries are exhausted.
+    """
+    client = get_client()
+    model = kwargs.get("model", "")
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        wait_start = time.perf_counter()
+        await _bucket.acquire()
+        STAGE_SECONDS.observe(time.perf_counter() - wait_start, stage="llm_rate_limit_wait")
+        _stats["requests"] += 1
+        delay = 0
+        call_start = time.perf_counter()
+        outcome = "error"
+        try:
+            raw = await client.chat.completions.with_raw_response.create(
+                timeout=timeout or LLM_TIMEOUT, **kwargs
+            )
+            _bucket.update_from_headers(raw.headers)
+            completion = raw.parse()
+            if inspect.isawaitable(completion):
+                completion = await completion
+            outcome = "ok"
+            return completion
+        except RateLimitError as e:
+            outcome = "rate_limited"
+            _stats["rate_limited"] += 1
+            headers = e.response.headers
+            _bucket.update_from_headers(headers)
+            wait = _parse_duration(headers.get("retry-after")) or _parse_duration(headers.get("x-ratelimit-reset-requests"))
+            # Pause the shared bucket so every caller waits, not just this one
+            _bucket.pause(wait if wait else _backoff(attempt))
+            error = e
+        except (APITimeoutError, APIConnectionError) as e:
+            outcome = "timeout" if isinstance(e, APITimeoutError) else "connection_error"
+            error = e
+            delay = _backoff(attempt)
+        except APIStatusError as e:
+            if e.status_code < 500:
+                _stats["failures"] += 1
+                raise
+            error = e
+            delay = _backoff(attempt)
+        finally:
+            LLM_SECONDS.observe(time.perf_counter() - call_start, model=model, outcome=outcome)
+        if attempt == LLM_MAX_RETRIES:
+            break
+        _stats["retries"] += 1
+        await asyncio.sleep(delay)
+    _stats["failures"] += 1
+    raise error
+
+
+async def chat_json(messages: list, model: str, temperature: float, timeout: float = None):
+    """Runs a JSON-mode completion and returns the parsed object."""
+    completion = await chat_completion(
+        messages=messages,
+        model=model,
+        temperature=temperature,
+        response_format={"type": "json_object"},
+        timeout=timeout,
+    )
+    return json.loads(completion.choices[0].message.content)
+
+
+async def chat_stream(messages: list, model: str, temperature: float, timeout: float = None):
+    """
+    Yields the completion text as it is generated. Rate limiting and retries
+    apply to opening the stream; a stream that breaks midway raises, since the
+    caller has already consumed part of it.
+    """
+    # No response_format: JSON mode can't be combined with streaming, the prompt asks for JSON instead
+    started = time.perf_counter()
+    stream = await chat_completion(
+        messages=messages,
+        model=model,
+        temperature=temperature,
+        stream=True,
+        timeout=timeout,
+    )
+    first = True
+    try:
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            text = chunk.choices[0].delta.content
+            if text:
+                if first:
+                    STAGE_SECONDS.observe(time.perf_counter() - started, stage="llm_first_token")
+                    first = False
+                yield text
+    finally:
+        # Releases the connection when the consumer stops early (e.g. the client went away)
+        await stream.close()
+
+
+def gateway_stats():
+    return {
+        **_stats,
+        "bucket_tokens": round(_bucket.tokens, 2),
+        "paused_for_seconds": round(max(_bucket.blocked_until - time.monotonic(), 0.0), 2),
+    }
@@ -0,0 +1,89 @@
+import os
+import time
+import threading
+from collections import defaultdict
+from dotenv import load_dotenv
+
+# This is the first service module to be imported, so .env has to be read here
+load_dotenv()
+
+# Heavy models (spaCy, Vosk, the embedding model, the Groq client) are loaded on
+# first use instead of at import, so a worker restart only pays for what it
+# actually touches. Every load is timed and its RSS growth recorded for /models.
+# WARMUP=vosk,spacy (or "all") loads the listed models at startup instead.
+WARMUP = os.environ.get("WARMUP", "")
+
+_loaders = {}
+_models = {}
+_reports = {}
+_locks = defaultdict(threading.Lock)
+
+
+def _rss_mb():
+    try:
+        import psutil
+        return round(psutil.Process().memory_info().rss / 1e6, 1)
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6, 1)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def register(name: str, loader):
+    """Registers a zero-argument loader; nothing is loaded until get_model(name)."""
+    _loaders[name] = loader
+    _reports.setdefault(name, {"loaded": False})
+
+
+def get_model(name: str):
+    if name in _models:
+        return _models[name]
+    with _locks[name]:
+        if name in _models:
+            return _models[name]
+        rss_before = _rss_mb()
+        start = time.perf_counter()
+        model = _loaders[name]()
+        seconds = time.perf_counter() - start
+        rss_after = _rss_mb()
+        # RSS growth is approximate when other loads or requests run at the same time
+        rss_delta = round(rss_after - rss_before, 1) if rss_before is not None and rss_after is not None else None
+        _reports[name] = {
+            "loaded": True,
+            "available": model is not None,
+            "load_seconds": round(seconds, 3),
+            "rss_delta_mb": rss_delta,
+            "loaded_at": time.time(),
+        }
+        print(f"Loaded model '{name}' in {seconds:.2f}s, RSS delta {rss_delta} MB")
+        _models[name] = model
+        return model
+
+
+def unload(name: str):
+    """Drops a loaded model (it is loaded again on next use) and returns it for cleanup."""
+    with _locks[name]:
+        model = _models.pop(name, None)
+        _reports[name] = {"loaded": False}
+        return model
+
+
+def warmup(names: str = None):
+    """Loads the comma separated models (default: WARMUP) up front; 'all' loads every registered model."""
+    names = WARMUP if names is None else names
+    wanted = list(_loaders) if names.strip() == "all" else [n.strip() for n in names.split(",") if n.strip()]
+    for name in wanted:
+        if name not in _loaders:
+            print(f"WARNING: unknown model '{name}' in WARMUP, known models: {', '.join(_loaders)}")
+            continue
+        try:
+            get_model(name)
+        except Exception as e:
+            print(f"Warm-up of '{name}' failed: {e}")
+
+
+def model_report():
+    return {"models": {name: dict(report) for name, report in _reports.items()}, "rss_mb": _rss_mb()}
@@ -0,0 +1,88 @@
+import io
+import os
+import asyncio
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pdfminer.high_level import extract_text
+from pdfminer.pdfpage import PDFPage
+
+# PDF text extraction straight from memory (no temp files), with size/page caps.
+# pdfminer's layout analysis is CPU bound and page independent, so multi-page
+# documents are split into page ranges that are extracted in parallel.
+
+RESUME_MAX_BYTES = int(os.environ.get("RESUME_MAX_BYTES", str(5 * 1024 * 1024)))
+RESUME_MAX_PAGES = int(os.environ.get("RESUME_MAX_PAGES", "10"))
+# Processes for page-parallel extraction; 0 extracts in the calling thread
+PDF_WORKERS = int(os.environ.get("PDF_WORKERS", "2"))
+# Fewer pages than this aren't worth the round trip to the pool
+PDF_PARALLEL_MIN_PAGES = int(os.environ.get("PDF_PARALLEL_MIN_PAGES", "3"))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class ResumeTooLargeError(Exception):
+    """Raised when an upload exceeds RESUME_MAX_BYTES or RESUME_MAX_PAGES."""
+
+
+class InvalidPdfError(Exception):
+    """Raised when the upload can't be read as a PDF."""
+
+
+def count_pages(data: bytes):
+    """Walks the page tree (no layout analysis) and stops as soon as the page cap is exceeded."""
+    pages = 0
+    try:
+        for _ in PDFPage.get_pages(io.BytesIO(data), maxpages=RESUME_MAX_PAGES + 1):
+            pages += 1
+    except Exception as e:
+        raise InvalidPdfError(f"Could not read PDF: {e}")
+    if pages > RESUME_MAX_PAGES:
+        raise ResumeTooLargeError(f"Resume has more than {RESUME_MAX_PAGES} pages")
+    return pages
+
+
+def _extract_pages(data: bytes, page_numbers: list):
+    # Runs in a worker; every page ends with a form feed just like a whole-document extract
+    return extract_text(io.BytesIO(data), page_numbers=page_numbers)
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(
+                    max_workers=PDF_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+                print(f"PDF worker pool started with {PDF_WORKERS} processes")
+    return _executor
+
+
+def shutdown_pdf_pool():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def extract_pdf_text(data: bytes):
+    """Returns (text, page count) for an in-memory PDF. Raises ResumeTooLargeError / InvalidPdfError."""
+    if len(data) > RESUME_MAX_BYTES:
+        raise ResumeTooLargeError(f"Resume is larger than {RESUME_MAX_BYTES // (1024 * 1024)} MB")
+
+    loop = asyncio.get_running_loop()
+    pages = await loop.run_in_executor(None, count_pages, data)
+
+    if PDF_WORKERS <= 0 or pages < PDF_PARALLEL_MIN_PAGES:
+        text = await loop.run_in_executor(None, _extract_pages, data, list(range(pages)))
+        return text, pages
+
+    # Contiguous page ranges, one per worker, so each worker parses the document once
+    size = -(-pages // PDF_WORKERS)
+    groups = [list(range(start, min(start + size, pages))) for start in range(0, pages, size)]
+    executor = _get_executor()
+    parts = await asyncio.gather(*[loop.run_in_executor(executor, _extract_pages, data, group) for group in groups])
+    return "".join(parts), pages
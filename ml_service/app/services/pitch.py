@@ -0,0 +1,119 @@
+import os
+
+import librosa
+import numpy as np
+
+# Which estimator feeds pitch_variance:
+#   "piptrack" - librosa.piptrack over the whole signal (original behaviour)
+#   "autocorr" - batched autocorrelation F0, only on frames inside voiced intervals
+# The two are not on the same scale: piptrack's value is the spread of every
+# peak candidate in the spectrogram, autocorr's is the spread of the actual F0.
+PITCH_ENGINE = os.environ.get("PITCH_ENGINE", "piptrack")
+
+# Speaking voice range
+FMIN = 65.0
+FMAX = 400.0
+# 40 ms frames hold at least two periods at FMIN; 20 ms hop
+FRAME_LENGTH = 640
+HOP_LENGTH = 320
+# Smallest power of two that fits a frame plus the longest lag without wrap-around
+FFT_SIZE = 1024
+# Frames whose normalized autocorrelation peak is below this are treated as unvoiced
+VOICING_THRESHOLD = 0.45
+# Frames are processed in batches so the FFT buffers stay small on long answers
+BATCH_FRAMES = 512
+
+
+def _voiced_frames(y: np.ndarray, intervals):
+    # Strided views into y; nothing is copied until a batch is materialized
+    views = []
+    for start, end in intervals:
+        if end - start >= FRAME_LENGTH:
+            views.append(np.lib.stride_tricks.sliding_window_view(y[start:end], FRAME_LENGTH)[::HOP_LENGTH])
+    return views
+
+
+def _batch_f0(frames: np.ndarray, sr: int):
+    frames = frames - frames.mean(axis=1, keepdims=True)
+
+    # Autocorrelation of every frame at once via the FFT
+    spectrum = np.fft.rfft(frames, n=FFT_SIZE, axis=1)
+    acf = np.fft.irfft(np.abs(spectrum) ** 2, axis=1)[:, :FRAME_LENGTH]
+
+    energy = acf[:, 0]
+    has_energy = energy > 1e-10
+    # Normalize by energy and by the shrinking overlap so all lags are comparable
+    overlap = (FRAME_LENGTH - np.arange(FRAME_LENGTH)) / FRAME_LENGTH
+    acf = acf / np.where(has_energy, energy, 1.0)[:, None] / overlap[None, :]
+
+    lag_min = max(int(sr / FMAX), 2)
+    lag_max = min(int(sr / FMIN), FRAME_LENGTH - 2)
+    region = acf[:, lag_min - 1:lag_max + 2]
+    inner = region[:, 1:-1]
+    is_peak = (inner >= region[:, :-2]) & (inner >= region[:, 2:])
+    best = np.where(is_peak, inner, -np.inf).max(axis=1)
+
+    # The first strong peak is the period; later ones are its multiples
+    candidate = is_peak & (inner >= 0.9 * best[:, None])
+    idx = np.argmax(candidate, axis=1)
+    rows = np.arange(len(frames))
+    lag = idx + lag_min
+
+    # Parabolic interpolation around the chosen lag for sub-sample precision
+    left = acf[rows, lag - 1]
+    center = acf[rows, lag]
+    right = acf[rows, lag + 1]
+    denom = left - 2 * center + right
+    curved = np.abs(denom) > 1e-12
+    shift = np.where(curved, 0.5 * (left - right) / np.where(curved, denom, 1.0), 0.0)
+    f0 = sr / (lag + np.clip(shift, -1, 1))
+
+    voiced = has_energy & np.isfinite(best) & (center >= VOICING_THRESHOLD)
+    return f0, voiced
+
+
+def frame_f0(y: np.ndarray, sr: int, intervals):
+    """
+    Per-frame F0 (Hz) and voiced mask for every frame inside the given
+    non-silent intervals (as returned by librosa.effects.split), in order.
+    F0 is meaningless where the mask is False.
+    """
+    views = _voiced_frames(y, intervals)
+    if not views:
+        return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=bool)
+
+    f0s, masks = [], []
+    for view in views:
+        for offset in range(0, len(view), BATCH_FRAMES):
+            f0, voiced = _batch_f0(np.asarray(view[offset:offset + BATCH_FRAMES], dtype=np.float32), sr)
+            f0s.append(f0)
+            masks.append(voiced)
+    return np.concatenate(f0s), np.concatenate(masks)
+
+
+def voiced_f0(y: np.ndarray, sr: int, intervals):
+    """
+    Frame-level F0 (Hz) for the frames inside the given non-silent intervals
+    (as returned by librosa.effects.split). Unvoiced frames are dropped.
+    """
+    f0, voiced = frame_f0(y, sr, intervals)
+    return f0[voiced]
+
+
+def piptrack_values(y: np.ndarray, sr: int):
+    pitches, _ = librosa.piptrack(y=y, sr=sr)
+    return pitches[pitches > 0]
+
+
+def pitch_values(y: np.ndarray, sr: int, intervals=None, engine: str = None):
+    """
+    Returns the pitch samples pitch_variance is computed from, using the
+    configured engine. intervals are only needed by the autocorr engine and
+    are computed here if the caller has not already done it.
+    """
+    engine = engine or PITCH_ENGINE
+    if engine == "autocorr":
+        if intervals is None:
+            intervals = librosa.effects.split(y, top_db=20)
+        return voiced_f0(y, sr, intervals)
+    return piptrack_values(y, sr)
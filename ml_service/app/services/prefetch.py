@@ -0,0 +1,118 @@
+import os
+import time
+import asyncio
+from collections import OrderedDict
+from fastapi import BackgroundTasks
+from app.services.adaptive import suggest_next_difficulty
+from app.services.question_bank import get_questions
+
+# Speculative prefetch of the next question.
+# suggest_next_difficulty can only land on a handful of levels, so while the
+# current answer is being transcribed and scored we start fetching a question
+# for each of them and hand back whichever one the score selects.
+
+PREFETCH_TTL = float(os.environ.get("PREFETCH_TTL", "900"))
+PREFETCH_MAX_SESSIONS = int(os.environ.get("PREFETCH_MAX_SESSIONS", "500"))
+
+# session_id -> {"created": monotonic time, "tasks": {difficulty: asyncio.Task}}
+_sessions = OrderedDict()
+_stats = {"started": 0, "hits": 0, "misses": 0, "evicted": 0}
+# Banking jobs started by finished prefetches; kept referenced until they complete
+_banking = set()
+
+
+def candidate_difficulties(current_difficulty: int):
+    # Every level suggest_next_difficulty can return: score high, middling, low
+    return sorted({suggest_next_difficulty(current_difficulty, score) for score in (100, 65, 0)})
+
+
+def _cancel(entry):
+    for task in entry["tasks"].values():
+        if not task.done():
+            task.cancel()
+
+
+def _evict_expired():
+    now = time.monotonic()
+    while _sessions:
+        session_id, entry = next(iter(_sessions.items()))
+        if now - entry["created"] < PREFETCH_TTL and len(_sessions) <= PREFETCH_MAX_SESSIONS:
+            break
+        _sessions.popitem(last=False)
+        _cancel(entry)
+        _stats["evicted"] += len(entry["tasks"])
+
+
+async def _prefetch(resume_text: str, topics: list, count: int, difficulty: int, exclude: list):
+    # Same background work as a live request: low topics get a (resume-agnostic) refill.
+    # It runs as its own task, so handing the questions over doesn't wait for it and dropping
+    # an unused prefetch later doesn't cancel it
+    banking = BackgroundTasks()
+    questions = await get_questions(resume_text, topics, count=count, difficulty=difficulty, exclude=exclude, background_tasks=banking)
+    if banking.tasks:
+        job = asyncio.create_task(banking())
+        _banking.add(job)
+        job.add_done_callback(_banking.discard)
+    return questions
+
+
+def start_prefetch(session_id: str, resume_text: str, topics: list, current_difficulty: int, count: int = 1, exclude: list = None, difficulties: list = None):
+    """
+    Starts fetching questions for every reachable next difficulty (or the given
+    difficulties, e.g. from the adaptive engine). Replaces any earlier prefetch for the session.
+    """
+    previous = _sessions.pop(session_id, None)
+    if previous:
+        _cancel(previous)
+        _stats["evicted"] += len(previous["tasks"])
+
+    tasks = {}
+    for difficulty in difficulties or candidate_difficulties(current_difficulty):
+        tasks[difficulty] = asyncio.create_task(_prefetch(resume_text, topics, count, difficulty, exclude))
+        _stats["started"] += 1
+    _sessions[session_id] = {"created": time.monotonic(), "tasks": tasks}
+    _evict_expired()
+    return list(tasks)
+
+
+async def take_prefetched(session_id: str, difficulty: int):
+    """
+    Returns the prefetched questions for this difficulty (waiting if still in flight),
+    or None if there is nothing usable. The session's other prefetches are dropped.
+    """
+    entry = _sessions.pop(session_id, None)
+    if entry is None:
+        _stats["misses"] += 1
+        return None
+
+    task = entry["tasks"].pop(difficulty, None)
+    _cancel(entry)
+    _stats["evicted"] += len(entry["tasks"])
+    if task is None:
+        _stats["misses"] += 1
+        return None
+
+    try:
+        # Shielded so that cancelling this request doesn't cancel the prefetch along with it
+        questions = await asyncio.shield(task)
+    except asyncio.CancelledError:
+        if not task.cancelled():
+            # The request itself was cancelled
+            raise
+        print(f"Prefetch for session {session_id} was cancelled")
+        _stats["misses"] += 1
+        return None
+    except Exception as e:
+        print(f"Prefetch for session {session_id} failed: {e!r}")
+        _stats["misses"] += 1
+        return None
+
+    if not questions or any("error" in q for q in questions):
+        _stats["misses"] += 1
+        return None
+    _stats["hits"] += 1
+    return questions
+
+
+def prefetch_stats():
+    return {**_stats, "sessions": len(_sessions)}
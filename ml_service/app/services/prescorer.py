@@ -0,0 +1,198 @@
+import os
+import re
+import json
+import math
+from app.services.embeddings import embed
+
+# Local scoring tier in front of the LLM. Every answer gets two cheap signals:
+# cosine similarity to the ideal answer (CPU sentence embeddings) and keyword
+# coverage (exact token match, or a close embedding match against a window of
+# the answer, so synonyms count). Linear models fitted on exported LLM scores
+# turn them into the usual semantic/keyword/grammar/final scores.
+#
+# Only clear-cut answers are scored locally: too short, off-topic, or predicted
+# well outside the [low, high] band even allowing for the model's error. The
+# rest go to the LLM as before. The band and models come from
+# PRESCORER_CALIBRATION, written by research/calibrate_prescorer.py; until a
+# calibration has been run, only the too-short and off-topic rules apply.
+# Off by default: the bundled calibration is a placeholder, not fitted on real scores.
+
+PRESCORER_ENABLED = os.environ.get("PRESCORER_ENABLED", "0") == "1"
+PRESCORER_CALIBRATION = os.environ.get(
+    "PRESCORER_CALIBRATION", os.path.join(os.path.dirname(__file__), "..", "data", "prescorer_calibration.json")
+)
+
+FEATURES = ["bias", "similarity", "coverage", "log_words"]
+# Words per answer window matched against keywords
+WINDOW_WORDS = 8
+
+_calibration = None
+# Set on the first failure (usually the embedding model not loading); the local tier stays off after that
+_disabled_reason = None
+_stats = {"local": 0, "llm": 0, "errors": 0}
+
+
+def load_calibration(path: str = None):
+    global _calibration
+    with open(path or PRESCORER_CALIBRATION) as f:
+        calibration = json.load(f)
+    if calibration.get("features") != FEATURES:
+        raise ValueError(f"Calibration features {calibration.get('features')} don't match {FEATURES}; re-run the calibration")
+    _calibration = calibration
+    return _calibration
+
+
+def get_calibration():
+    return _calibration if _calibration is not None else load_calibration()
+
+
+def _tokens(text: str):
+    # Crude plural folding so "indexes"/"index" and "hooks"/"hook" match
+    words = re.findall(r"[a-z0-9][a-z0-9+#.\-]*", (text or "").lower())
+    return [w[:-1] if len(w) > 3 and w.endswith("s") and not w.endswith("ss") else w for w in words]
+
+
+def _windows(words: list):
+    if len(words) <= WINDOW_WORDS:
+        return [" ".join(words)]
+    step = WINDOW_WORDS // 2
+    return [" ".join(words[i:i + WINDOW_WORDS]) for i in range(0, len(words) - step, step)]
+
+
+def features(items: list):
+    """
+    Prescoring signals for many answers with a single embedding call.
+    items are dicts with answer_text, question_text, ideal_answer_text, ideal_keywords.
+    """
+    calibration = get_calibration()
+    texts = {}
+
+    def slot(text):
+        return texts.setdefault(text, len(texts))
+
+    plans = []
+    for item in items:
+        answer = item.get("answer_text") or ""
+        words = answer.split()
+        # Without an ideal answer the question is the best reference there is
+        reference = item.get("ideal_answer_text") or item.get("question_text") or ""
+        keywords = [k for k in (item.get("ideal_keywords") or []) if isinstance(k, str) and k.strip()]
+        answer_tokens = set(_tokens(answer))
+        exact = [bool(_tokens(k)) and set(_tokens(k)) <= answer_tokens for k in keywords]
+        plans.append({
+            "words": len(words),
+            "answer": slot(answer),
+            "reference": slot(reference),
+            "keywords": keywords,
+            "exact": exact,
+            "keyword_slots": [slot(k) for k, hit in zip(keywords, exact) if not hit],
+            "window_slots": [slot(w) for w in _windows(words)] if not all(exact) else [],
+        })
+
+    vectors = embed(list(texts))
+    results = []
+    for plan in plans:
+        similarity = float(vectors[plan["answer"]] @ vectors[plan["reference"]]) if plan["words"] else 0.0
+        missing = [k for k, hit in zip(plan["keywords"], plan["exact"]) if not hit]
+        if plan["keyword_slots"] and plan["window_slots"]:
+            # keywords x windows similarity; a keyword counts if any window is close enough
+            matrix = vectors[plan["keyword_slots"]] @ vectors[plan["window_slots"]].T
+            close = matrix.max(axis=1) >= calibration["keyword_similarity"]
+            missing = [k for k, hit in zip(missing, close) if not hit]
+        if plan["keywords"]:
+            coverage = 1.0 - len(missing) / len(plan["keywords"])
+        else:
+            # No keywords to check: let similarity stand in for coverage
+            coverage = min(1.0, max(0.0, (similarity - 0.2) / 0.6))
+        results.append({
+            "similarity": similarity,
+            "coverage": coverage,
+            "words": plan["words"],
+            "missing_keywords": missing,
+        })
+    return results
+
+
+def _predict(model: dict, signals: dict):
+    x = {"bias": 1.0, "similarity": signals["similarity"], "coverage": signals["coverage"],
+         "log_words": math.log1p(signals["words"])}
+    value = sum(c * x[name] for name, c in zip(FEATURES, model["coef"]))
+    return min(100.0, max(0.0, value))
+
+
+def _feedback(reason: str, signals: dict):
+    missing = signals["missing_keywords"][:3]
+    if reason == "too_short":
+        return "The answer is too short to evaluate. Explain your reasoning in a few full sentences."
+    if reason == "off_topic":
+        return "The answer does not address the question. Re-read the question and focus on what it asks."
+    if reason == "low":
+        text = "The answer misses most of what the question is looking for."
+        return text + (f" Cover key concepts such as {', '.join(missing)}." if missing else "")
+    text = "Strong answer that covers the key concepts clearly."
+    return text + (f" You could also mention {', '.join(missing)}." if missing else "")
+
+
+def decide(signals: dict):
+    """Local scores for a clear-cut answer, or None if it should go to the LLM."""
+    calibration = get_calibration()
+    models = calibration["models"]
+    scores = {name: _predict(models[name], signals) for name in ("semantic_score", "keyword_score", "grammar_score")}
+
+    reason = None
+    if signals["words"] < calibration["min_words"]:
+        reason = "too_short"
+        scores = {"semantic_score": 0.0, "keyword_score": 100.0 * signals["coverage"], "grammar_score": 0.0}
+    elif signals["similarity"] < calibration["offtopic_similarity"]:
+        reason = "off_topic"
+        scores["semantic_score"] = 0.0
+    final = 0.5 * scores["semantic_score"] + 0.3 * scores["keyword_score"] + 0.2 * scores["grammar_score"]
+
+    band = calibration.get("band")
+    if reason is None and band:
+        margin = band["margin"] * calibration["final_resid_std"]
+        if final + margin <= band["low"]:
+            reason = "low"
+        elif final - margin >= band["high"]:
+            reason = "high"
+    if reason is None:
+        return None
+
+    result = {name: int(round(value)) for name, value in scores.items()}
+    result["final_score"] = int(round(final))
+    result["feedback_text"] = _feedback(reason, signals)
+    result["scored_by"] = "local"
+    result["local_reason"] = reason
+    return result
+
+
+def prescore_batch(items: list):
+    """
+    Local result (or None) per item, in order. Any failure sends everything to
+    the LLM and turns the local tier off for the rest of the process, so a
+    model that can't load isn't retried on every request.
+    """
+    global _disabled_reason
+    if not PRESCORER_ENABLED or _disabled_reason or not items:
+        return [None] * len(items)
+    try:
+        results = [decide(signals) for signals in features(items)]
+    except Exception as e:
+        _disabled_reason = f"{type(e).__name__}: {e}"
+        print(f"Prescoring failed, using the LLM from now on: {e}")
+        _stats["errors"] += 1
+        return [None] * len(items)
+    local = sum(r is not None for r in results)
+    _stats["local"] += local
+    _stats["llm"] += len(results) - local
+    return results
+
+
+def prescorer_stats():
+    calibration = _calibration or {}
+    return {
+        **_stats,
+        "enabled": PRESCORER_ENABLED and _disabled_reason is None,
+        "disabled_reason": _disabled_reason,
+        "calibration": calibration.get("version"),
+    }
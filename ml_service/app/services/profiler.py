@@ -0,0 +1,77 @@
+import os
+import sys
+import time
+import threading
+from collections import Counter
+
+# Stdlib sampling profiler for the API process, switched on and off at runtime
+# through /profiler/start and /profiler/stop. A background thread snapshots
+# every thread's stack at a fixed interval; the report is in collapsed-stack
+# format ("a;b;c count") that flamegraph.pl / speedscope read directly.
+# Disabled unless PROFILER_ENABLED=1, since it exposes code paths.
+PROFILER_ENABLED = os.environ.get("PROFILER_ENABLED", "0") == "1"
+# Stop on our own if nobody calls /profiler/stop
+PROFILER_MAX_SECONDS = float(os.environ.get("PROFILER_MAX_SECONDS", "300"))
+
+
+class SamplingProfiler:
+    def __init__(self):
+        self._thread = None
+        self._stop = threading.Event()
+        self._stacks = Counter()
+        self._samples = 0
+        self._started_at = None
+        self._interval = 0.01
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval: float = 0.01):
+        if self.running:
+            return False
+        self._stacks = Counter()
+        self._samples = 0
+        self._interval = max(interval, 0.001)
+        self._started_at = time.time()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self, top: int = 200):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.report(top)
+
+    def _run(self):
+        own = threading.get_ident()
+        deadline = time.monotonic() + PROFILER_MAX_SECONDS
+        while not self._stop.wait(self._interval) and time.monotonic() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                with self._lock:
+                    self._stacks[";".join(reversed(stack))] += 1
+            self._samples += 1
+
+    def report(self, top: int = 200):
+        with self._lock:
+            stacks = self._stacks.most_common(top)
+        return {
+            "running": self.running,
+            "started_at": self._started_at,
+            "interval": self._interval,
+            "samples": self._samples,
+            "stacks": [f"{stack} {count}" for stack, count in stacks],
+        }
+
+
+profiler = SamplingProfiler()
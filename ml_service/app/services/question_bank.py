@@ -0,0 +1,287 @@
+import os
+import json
+import random
+import sqlite3
+import threading
+import time
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+from app.services.embeddings import embed
+from app.services.generator import generate_interview_questions, stream_interview_questions
+from app.services.resume_parser import extract_skills
+
+# Pre-generated questions served by nearest-neighbour lookup instead of a
+# 70B completion per session. Questions are stored in SQLite with their
+# embeddings; the embeddings are also kept in memory as one matrix, so a
+# lookup is a single matrix-vector product.
+#
+# The bank is shared by every candidate, so only resume-agnostic questions go
+# into it (seed_bank and the background refills). Questions generated for a
+# particular resume are served to that candidate and never banked.
+
+QUESTION_BANK_ENABLED = os.environ.get("QUESTION_BANK_ENABLED", "1") == "1"
+QUESTION_BANK_DB = os.environ.get("QUESTION_BANK_DB", "data/question_bank.db")
+# Below this cosine similarity a banked question is not considered a match
+BANK_MIN_SIMILARITY = float(os.environ.get("QUESTION_BANK_MIN_SIMILARITY", "0.35"))
+# Refill a topic in the background once it has fewer questions than this
+BANK_MIN_PER_TOPIC = int(os.environ.get("QUESTION_BANK_MIN_PER_TOPIC", "20"))
+BANK_REFILL_BATCH = int(os.environ.get("QUESTION_BANK_REFILL_BATCH", "5"))
+# After a failed refill (LLM error, embedding model missing, ...) the topic isn't retried for this long
+BANK_REFILL_COOLDOWN = float(os.environ.get("QUESTION_BANK_REFILL_COOLDOWN", "600"))
+
+# What refills and seeding send instead of a resume, so banked questions fit any candidate
+NO_RESUME = "No resume provided. Generate broadly applicable questions."
+
+QUESTION_FIELDS = ("question_text", "topic", "difficulty_level", "ideal_answer_keywords", "ideal_answer_text")
+
+
+class QuestionBank:
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._db = None
+        self._lock = threading.Lock()
+        self._questions = []
+        self._vectors = None
+        self._refilling = set()
+        # (topic, difficulty) -> monotonic time before which a failed refill isn't retried
+        self._refill_failed = {}
+
+    def _open(self):
+        if self._db is not None:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS questions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                question_text TEXT NOT NULL UNIQUE,
+                topic TEXT NOT NULL,
+                difficulty_level INTEGER,
+                ideal_answer_keywords TEXT,
+                ideal_answer_text TEXT,
+                embedding BLOB NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        self._db.commit()
+
+        rows = self._db.execute(
+            "SELECT question_text, topic, difficulty_level, ideal_answer_keywords, ideal_answer_text, embedding FROM questions ORDER BY id"
+        ).fetchall()
+        vectors = []
+        for text, topic, difficulty, keywords, ideal, blob in rows:
+            self._questions.append({
+                "question_text": text,
+                "topic": topic,
+                "difficulty_level": difficulty,
+                "ideal_answer_keywords": json.loads(keywords or "[]"),
+                "ideal_answer_text": ideal,
+            })
+            vectors.append(np.frombuffer(blob, dtype=np.float32))
+        self._vectors = np.vstack(vectors) if vectors else None
+        print(f"Question bank loaded with {len(self._questions)} questions")
+
+    @staticmethod
+    def _question_document(q: dict):
+        keywords = ", ".join(q.get("ideal_answer_keywords") or [])
+        return f"{q['topic']}. {q['question_text']} {keywords}"
+
+    @staticmethod
+    def _query_document(topics: list, skills: list):
+        return f"{', '.join(topics)}. Skills: {', '.join(skills)}"
+
+    @staticmethod
+    def _bank_topic(topic: str, requested: list):
+        # The LLM often refines the topic ("React" -> "React Hooks"); file it under
+        # the topic that was asked for so later lookups on that topic find it
+        if not requested:
+            return topic
+        lowered = topic.lower()
+        for t in requested:
+            if t.lower() == lowered or t.lower() in lowered or lowered in t.lower():
+                return t
+        return requested[0] if len(requested) == 1 else topic
+
+    def add(self, questions: list, topics: list = None):
+        """Stores generated questions (and their embeddings); returns how many were new."""
+        clean = []
+        for q in questions:
+            if not isinstance(q, dict) or "error" in q or not q.get("question_text") or not q.get("topic"):
+                continue
+            clean.append({
+                "question_text": q["question_text"].strip(),
+                "topic": self._bank_topic(q["topic"].strip(), topics),
+                "difficulty_level": max(1, min(5, int(q.get("difficulty_level") or 3))),
+                "ideal_answer_keywords": q.get("ideal_answer_keywords") if isinstance(q.get("ideal_answer_keywords"), list) else [],
+                "ideal_answer_text": q.get("ideal_answer_text") or "",
+            })
+        if not clean:
+            return 0
+
+        vectors = embed([self._question_document(q) for q in clean])
+        new_vectors = []
+        with self._lock:
+            self._open()
+            for q, vector in zip(clean, vectors):
+                cursor = self._db.execute(
+                    "INSERT OR IGNORE INTO questions (question_text, topic, difficulty_level, ideal_answer_keywords, ideal_answer_text, embedding) VALUES (?, ?, ?, ?, ?, ?)",
+                    (q["question_text"], q["topic"], q["difficulty_level"], json.dumps(q["ideal_answer_keywords"]), q["ideal_answer_text"], vector.tobytes()),
+                )
+                if cursor.rowcount:
+                    self._questions.append(q)
+                    new_vectors.append(vector)
+            self._db.commit()
+            if new_vectors:
+                stacked = np.vstack(new_vectors)
+                self._vectors = stacked if self._vectors is None else np.vstack([self._vectors, stacked])
+        return len(new_vectors)
+
+    def count(self, topic: str, difficulty: int = None):
+        with self._lock:
+            self._open()
+            return sum(
+                1 for q in self._questions
+                if q["topic"].lower() == topic.lower() and (difficulty is None or q["difficulty_level"] == difficulty)
+            )
+
+    def lookup(self, resume_text: str, topics: list, count: int, difficulty: int = None, exclude: list = None):
+        """
+        Nearest banked questions for the resume skills + topics.
+        Only questions on one of the requested topics are considered; with a
+        difficulty, exact matches come first, then +-1.
+        """
+        with self._lock:
+            self._open()
+            if self._vectors is None:
+                return []
+            questions = list(self._questions)
+            vectors = self._vectors
+
+        wanted_topics = {t.lower() for t in topics}
+        excluded = {e.strip().lower() for e in (exclude or [])}
+        candidates = [
+            i for i, q in enumerate(questions)
+            if q["topic"].lower() in wanted_topics and q["question_text"].lower() not in excluded
+        ]
+        if not candidates:
+            return []
+
+        query = embed([self._query_document(topics, extract_skills(resume_text))])[0]
+        similarity = vectors[candidates] @ query
+
+        picked = []
+        tiers = [0, 1] if difficulty else [None]
+        for tier in tiers:
+            pool = [
+                (sim, i) for sim, i in zip(similarity, candidates)
+                if sim >= BANK_MIN_SIMILARITY and i not in picked
+                and (tier is None or abs(questions[i]["difficulty_level"] - difficulty) == tier)
+            ]
+            pool.sort(reverse=True)
+            # Sample from the best few so repeat sessions don't always get the same set
+            top = [i for _, i in pool[:max((count - len(picked)) * 3, 1)]]
+            picked.extend(random.sample(top, min(len(top), count - len(picked))))
+            if len(picked) >= count:
+                break
+
+        return [{field: questions[i][field] for field in QUESTION_FIELDS} for i in picked]
+
+    async def refill(self, topics: list, difficulty: int = None):
+        """Background job: generates more (resume-agnostic) questions for topics that are running low."""
+        now = time.monotonic()
+        low = [
+            t for t in topics
+            if (t.lower(), difficulty) not in self._refilling
+            and self._refill_failed.get((t.lower(), difficulty), 0) <= now
+            and self.count(t, difficulty) < BANK_MIN_PER_TOPIC
+        ]
+        if not low:
+            return
+        keys = {(t.lower(), difficulty) for t in low}
+        self._refilling |= keys
+        try:
+            generated = await generate_interview_questions(NO_RESUME, low, count=BANK_REFILL_BATCH, difficulty=difficulty)
+            errors = [q["error"] for q in generated if isinstance(q, dict) and "error" in q]
+            if errors and len(errors) == len(generated):
+                raise RuntimeError(errors[0])
+            added = await run_in_threadpool(self.add, generated, low)
+            print(f"Question bank refill for {low}: {added} new questions")
+        except Exception as e:
+            # Without a cooldown every request would pay for another generation that can't be stored
+            print(f"Question bank refill failed, not retrying {low} for {BANK_REFILL_COOLDOWN:.0f}s: {e}")
+            for key in keys:
+                self._refill_failed[key] = time.monotonic() + BANK_REFILL_COOLDOWN
+        finally:
+            self._refilling -= keys
+
+
+question_bank = QuestionBank(QUESTION_BANK_DB)
+
+
+async def get_questions(resume_text: str, topics: list, count: int = 3, difficulty: int = None, exclude: list = None, background_tasks=None):
+    """
+    Serves questions from the bank, generating only what the bank can't cover.
+    Low topics are refilled in the background; the questions generated here are
+    conditioned on this resume, so they are not banked.
+    """
+    if not QUESTION_BANK_ENABLED:
+        return await generate_interview_questions(resume_text, topics, count=count, difficulty=difficulty)
+
+    try:
+        questions = await run_in_threadpool(question_bank.lookup, resume_text, topics, count, difficulty, exclude)
+    except Exception as e:
+        print(f"Question bank lookup failed: {e}")
+        questions = []
+
+    if len(questions) < count:
+        generated = await generate_interview_questions(resume_text, topics, count=count - len(questions), difficulty=difficulty)
+        if questions:
+            # Partial bank hit: don't mix generator errors into good questions
+            generated = [q for q in generated if "error" not in q]
+        questions = questions + generated
+
+    if background_tasks is not None:
+        background_tasks.add_task(question_bank.refill, topics, difficulty)
+    return questions
+
+
+async def stream_questions(resume_text: str, topics: list, count: int = 3, difficulty: int = None, exclude: list = None, background_tasks=None):
+    """
+    get_questions, one question at a time: bank hits are yielded straight away,
+    generated questions as soon as each one is complete in the LLM stream.
+    """
+    questions = []
+    if QUESTION_BANK_ENABLED:
+        try:
+            questions = await run_in_threadpool(question_bank.lookup, resume_text, topics, count, difficulty, exclude)
+        except Exception as e:
+            print(f"Question bank lookup failed: {e}")
+        for question in questions:
+            yield question
+
+    if len(questions) < count:
+        async for question in stream_interview_questions(resume_text, topics, count=count - len(questions), difficulty=difficulty):
+            yield question
+
+    if QUESTION_BANK_ENABLED and background_tasks is not None:
+        background_tasks.add_task(question_bank.refill, topics, difficulty)
+
+
+async def seed_bank(topics: list, per_level: int):
+    """Pre-generates per_level questions for every topic at every difficulty."""
+    for topic in topics:
+        for difficulty in range(1, 6):
+            generated = await generate_interview_questions(NO_RESUME, [topic], count=per_level, difficulty=difficulty)
+            added = await run_in_threadpool(question_bank.add, generated, [topic])
+            print(f"{topic} / difficulty {difficulty}: {added} new questions")
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+
+    parser = argparse.ArgumentParser(description="Pre-generate questions into the question bank")
+    parser.add_argument("--topics", required=True, help="comma separated topics, e.g. React,SQL,Python")
+    parser.add_argument("--per-level", type=int, default=5, help="questions per topic and difficulty level")
+    args = parser.parse_args()
+    asyncio.run(seed_bank([t.strip() for t in args.topics.split(",") if t.strip()], args.per_level))
@@ -1,32 +1,59 @@
-from pdfminer.high_level import extract_text
-import spacy
-import re
-
-nlp = spacy.load("en_core_web_sm")
-
-def parse_resume_pdf(file_path: str):
-    text = extract_text(file_path)
-    doc = nlp(text)
-    
-    # Basic Skill Extraction (Heuristic/NER)
-    # In a real system, you'd use a fine-tuned NER model or a large skills database.
-    # Here we look for capitalized technical terms or known keywords.
-    
-    known_skills = {
-        "python", "java", "javascript", "typescript", "react", "node.js", 
-        "sql", "nosql", "docker", "kubernetes", "aws", "azure", "machine learning",
-        "deep learning", "pytorch", "tensorflow", "git", "ci/cd"
-    }
-    
-    found_skills = set()
-    
-    # check for exact matches in full text (case-insensitive)
-    text_lower = text.lower()
-    for skill in known_skills:
-        # Simple existence check. For more robustness, use regex boundries \b
-        if skill in text_lower:
-            found_skills.add(skill)
-            
-    # Also check specific patterns if needed
-    
-    return list(found_skills), text
+import os
+import time
+import hashlib
+from app.services.cache import ResultCache, make_key
+from app.services.metrics import stage_timer
+from app.services.model_registry import register, get_model
+from app.services.pdf_extract import extract_pdf_text
+from app.services.skill_index import load_taxonomy, build_skill_index, SKILL_MATCHER
+
+SPACY_MODEL = os.environ.get("SPACY_MODEL", "en_core_web_sm")
+# Skill matching only needs the tokenizer and vocab, never the tagger/parser/NER
+SPACY_EXCLUDE = ["tok2vec", "tagger", "parser", "senter", "attribute_ruler", "lemmatizer", "ner"]
+
+TAXONOMY_VERSION, _skill_patterns = load_taxonomy()
+
+# Extracted text keyed by the hash of the PDF bytes, so re-uploading the same resume skips pdfminer
+text_cache = ResultCache(
+    "resume_text",
+    max_entries=int(os.environ.get("RESUME_CACHE_SIZE", "256")),
+    db_path=os.environ.get("RESUME_CACHE_DB") or None,
+)
+
+
+def _load_nlp():
+    import spacy
+    return spacy.load(SPACY_MODEL, exclude=SPACY_EXCLUDE)
+
+
+def _load_skill_index():
+    # The default Aho-Corasick matcher doesn't need spaCy at all
+    nlp = get_model("spacy") if SKILL_MATCHER == "spacy" else None
+    index = build_skill_index(_skill_patterns, nlp=nlp)
+    print(f"Skill taxonomy {TAXONOMY_VERSION} compiled with {len(_skill_patterns)} patterns")
+    return index
+
+
+register("spacy", _load_nlp)
+register("skill_index", _load_skill_index)
+
+async def parse_resume_bytes(data: bytes):
+    """Skills, text and page count for an uploaded PDF, without touching the disk."""
+    key = make_key("resume_text", hashlib.sha256(data).hexdigest())
+    cached = text_cache.get(key)
+    if cached is None:
+        started = time.perf_counter()
+        with stage_timer("pdf_extract"):
+            text, pages = await extract_pdf_text(data)
+        text_cache.record_compute(time.perf_counter() - started)
+        cached = {"text": text, "pages": pages}
+        text_cache.set(key, cached)
+    # Skills are recomputed every time so taxonomy updates apply to cached resumes too
+    with stage_timer("skill_match"):
+        skills = extract_skills(cached["text"])
+    return skills, cached["text"], cached["pages"]
+
+def extract_skills(text: str):
+    # Skills are matched against the taxonomy in app/data/skills_taxonomy.json
+    # (or SKILLS_TAXONOMY) with word boundaries, and aliases map to one canonical name.
+    return sorted(get_model("skill_index").find(text))
@@ -1,25 +1,32 @@
 import os
-import json
-from groq import Groq
-from dotenv import load_dotenv
+import re
+import time
+import asyncio
+from starlette.concurrency import run_in_threadpool
+from app.services.cache import ResultCache, make_key
+from app.services.llm_gateway import chat_json
+from app.services.prescorer import prescore_batch
+from app.services.metrics import stage_timer
 
-load_dotenv()
+SCORE_MODEL = "llama-3.3-70b-versatile"
+# Bump whenever the scoring prompt changes so cached scores from the old prompt are not reused
+PROMPT_VERSION = "1"
 
-client = Groq(
-    api_key=os.environ.get("GROQ_API_KEY"),
+# Batch scoring: concurrent Groq calls per batch (the gateway still rate limits them), and which answers count as "short"
+# enough to share one prompt when packing is requested
+SCORE_BATCH_CONCURRENCY = int(os.environ.get("SCORE_BATCH_CONCURRENCY", "4"))
+PACK_MAX_WORDS = int(os.environ.get("SCORE_PACK_MAX_WORDS", "60"))
+PACK_SIZE = int(os.environ.get("SCORE_PACK_SIZE", "4"))
+
+# Scoring runs at temperature 0, so identical inputs can be served from cache
+score_cache = ResultCache(
+    "score_answer",
+    max_entries=int(os.environ.get("SCORE_CACHE_SIZE", "1024")),
+    db_path=os.environ.get("SCORE_CACHE_DB") or None,
+    ttl_seconds=float(os.environ.get("SCORE_CACHE_TTL", str(7 * 24 * 3600))),
 )
 
-def score_answer_text(answer_text: str, question_text: str, ideal_answer_text: str = None, ideal_keywords: list = None):
-    print(f"Scoring answer for question: {question_text}") # DEBUG
-    ideal_preview = ideal_answer_text[:50] if ideal_answer_text else "None"
-    print(f"Ideal Answer: {ideal_preview}...") # DEBUG
-    
-    try:
-        completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "system",
-                    "content": """You are an expert technical interviewer. Evaluate the candidate's answer based on the question and the ideal answer (if provided).
+SYSTEM_PROMPT = """You are an expert technical interviewer. Evaluate the candidate's answer based on the question and the ideal answer (if provided).
                     
                     IMPORTANT: The candidate's answer is a TRANSCRIPTION of speech. 
                     - Ignore minor transcription errors, lack of punctuation, or run-on sentences typical of speech to text.
@@ -32,33 +39,213 @@ def score_answer_text(answer_text: str, question_text: str, ideal_answer_text: s
                     - final_score (0-100): Weighted average (Semantic 50%, Keywords 30%, Grammar 20%).
                     - feedback_text: Constructive feedback (2-3 sentences max). Mention if it was a good spoken explanation.
                     """
-                },
-                {
-                    "role": "user",
-                    "content": f"""
+
+PACKED_SYSTEM_PROMPT = """You are an expert technical interviewer. You will receive several numbered items, each with a question, an ideal answer (if provided), keywords and the candidate's answer. Evaluate every item independently.
+
+                    IMPORTANT: The candidate's answers are TRANSCRIPTIONS of speech.
+                    - Ignore minor transcription errors, lack of punctuation, or run-on sentences typical of speech to text.
+                    - Focus on the SEMANTIC content and technical accuracy.
+
+                    Return ONLY valid JSON in the following format:
+                    {
+                        "results": [
+                            {
+                                "index": <item number>,
+                                "semantic_score": 0-100,
+                                "keyword_score": 0-100,
+                                "grammar_score": 0-100,
+                                "final_score": 0-100 (Semantic 50%, Keywords 30%, Grammar 20%),
+                                "feedback_text": "2-3 sentences max"
+                            }
+                        ]
+                    }
+                    """
+
+def _normalize(text):
+    return re.sub(r"\s+", " ", text or "").strip()
+
+def score_cache_key(answer_text: str, question_text: str, ideal_answer_text: str = None, ideal_keywords: list = None, packed: bool = False):
+    keywords = sorted({_normalize(k).lower() for k in (ideal_keywords or []) if _normalize(k)})
+    return make_key(
+        PROMPT_VERSION,
+        "packed" if packed else "single",
+        SCORE_MODEL,
+        _normalize(question_text),
+        _normalize(ideal_answer_text),
+        keywords,
+        _normalize(answer_text),
+    )
+
+def _item_prompt(answer_text, question_text, ideal_answer_text, ideal_keywords):
+    return f"""
                     Question: {question_text}
                     Ideal Answer: {ideal_answer_text or "Not provided, please infer from the question."}
                     Keywords: {ideal_keywords}
                     
                     Candidate Answer: {answer_text}
                     """
-                }
-            ],
-            model="llama-3.3-70b-versatile",
+
+def _messages(answer_text, question_text, ideal_answer_text, ideal_keywords):
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": _item_prompt(answer_text, question_text, ideal_answer_text, ideal_keywords)},
+    ]
+
+def _error_scores(e):
+    # Fallback to a basic structure on error
+    return {
+        "semantic_score": 0,
+        "keyword_score": 0,
+        "grammar_score": 0,
+        "final_score": 0,
+        "feedback_text": f"Error during evaluation: {str(e)}"
+    }
+
+async def _prescore(items: list):
+    # Embeddings are CPU work; keep them off the event loop
+    with stage_timer("prescore"):
+        return await run_in_threadpool(prescore_batch, items)
+
+async def score_answer_text(answer_text: str, question_text: str, ideal_answer_text: str = None, ideal_keywords: list = None):
+    print(f"Scoring answer for question: {question_text}") # DEBUG
+    ideal_preview = ideal_answer_text[:50] if ideal_answer_text else "None"
+    print(f"Ideal Answer: {ideal_preview}...") # DEBUG
+
+    cache_key = score_cache_key(answer_text, question_text, ideal_answer_text, ideal_keywords)
+    cached = score_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    # Clear-cut answers (too short, off-topic, obviously weak or strong) are scored locally
+    local = (await _prescore([{
+        "answer_text": answer_text,
+        "question_text": question_text,
+        "ideal_answer_text": ideal_answer_text,
+        "ideal_keywords": ideal_keywords,
+    }]))[0]
+    if local is not None:
+        return local
+
+    try:
+        started = time.perf_counter()
+        result = await chat_json(
+            messages=_messages(answer_text, question_text, ideal_answer_text, ideal_keywords),
+            model=SCORE_MODEL,
             temperature=0,
-            response_format={"type": "json_object"}
         )
-        
-        result = json.loads(completion.choices[0].message.content)
+        score_cache.record_compute(time.perf_counter() - started)
+        # Error fallbacks below are never cached
+        score_cache.set(cache_key, result)
         return result
 
     except Exception as e:
         print(f"Error calling Groq: {e}")
-        # Fallback to a basic structure on error
-        return {
-            "semantic_score": 0,
-            "keyword_score": 0,
-            "grammar_score": 0,
-            "final_score": 0,
-            "feedback_text": f"Error during evaluation: {str(e)}"
-        }
+        return _error_scores(e)
+
+async def _score_one(item: dict):
+    started = time.perf_counter()
+    result = await chat_json(
+        messages=_messages(item["answer_text"], item["question_text"], item.get("ideal_answer_text"), item.get("ideal_keywords")),
+        model=SCORE_MODEL,
+        temperature=0,
+    )
+    score_cache.record_compute(time.perf_counter() - started)
+    score_cache.set(score_cache_key(**item), result)
+    return result
+
+async def _score_packed(items: list):
+    """Scores several short answers with one completion. Returns {position: scores} for the items the model answered."""
+    content = "\n".join(
+        f"Item {n}:{_item_prompt(item['answer_text'], item['question_text'], item.get('ideal_answer_text'), item.get('ideal_keywords'))}"
+        for n, item in enumerate(items)
+    )
+    started = time.perf_counter()
+    result = await chat_json(
+        messages=[
+            {"role": "system", "content": PACKED_SYSTEM_PROMPT},
+            {"role": "user", "content": content},
+        ],
+        model=SCORE_MODEL,
+        temperature=0,
+    )
+    elapsed = time.perf_counter() - started
+
+    scored = {}
+    for entry in result.get("results", []):
+        n = entry.pop("index", None)
+        if isinstance(n, int) and 0 <= n < len(items) and n not in scored:
+            scored[n] = entry
+            score_cache.set(score_cache_key(**items[n], packed=True), entry)
+    if scored:
+        score_cache.record_compute(elapsed / len(scored))
+    return scored
+
+async def score_answers_batch(items: list, pack_short: bool = False):
+    """
+    Scores many answers at once with at most SCORE_BATCH_CONCURRENCY Groq calls in flight.
+    items are dicts with the score_answer_text arguments. Results come back in input
+    order; an item that fails gets the usual zero scores plus an "error" field
+    instead of failing the whole batch.
+    """
+    results = [None] * len(items)
+    pending = []
+    for i, item in enumerate(items):
+        if not _normalize(item.get("answer_text")):
+            results[i] = {**_error_scores("No text provided for scoring"), "error": "No text provided for scoring"}
+            continue
+        cached = score_cache.get(score_cache_key(**item))
+        if cached is None and pack_short:
+            cached = score_cache.get(score_cache_key(**item, packed=True))
+        if cached is not None:
+            results[i] = cached
+        else:
+            pending.append(i)
+
+    # One embedding pass for every uncached answer; only the ambiguous ones reach the LLM
+    if pending:
+        local = await _prescore([items[i] for i in pending])
+        for i, result in zip(pending, local):
+            if result is not None:
+                results[i] = result
+        pending = [i for i in pending if results[i] is None]
+
+    semaphore = asyncio.Semaphore(max(SCORE_BATCH_CONCURRENCY, 1))
+
+    async def run_single(i):
+        try:
+            results[i] = await _score_one(items[i])
+        except Exception as e:
+            print(f"Error calling Groq for batch item {i}: {e}")
+            results[i] = {**_error_scores(e), "error": str(e)}
+
+    async def single(i):
+        async with semaphore:
+            await run_single(i)
+
+    async def packed(group):
+        async with semaphore:
+            try:
+                scored = await _score_packed([items[i] for i in group])
+            except Exception as e:
+                print(f"Packed scoring failed, scoring items one by one: {e}")
+                scored = {}
+            for n, i in enumerate(group):
+                if n in scored:
+                    results[i] = scored[n]
+                else:
+                    # The model skipped or mangled this item; score it on its own
+                    await run_single(i)
+
+    tasks = []
+    if pack_short:
+        short = [i for i in pending if len(items[i]["answer_text"].split()) <= PACK_MAX_WORDS]
+        long = [i for i in pending if i not in short]
+        for start in range(0, len(short), max(PACK_SIZE, 1)):
+            group = short[start:start + max(PACK_SIZE, 1)]
+            tasks.append(packed(group) if len(group) > 1 else single(group[0]))
+        tasks.extend(single(i) for i in long)
+    else:
+        tasks.extend(single(i) for i in pending)
+
+    await asyncio.gather(*tasks)
+    return results
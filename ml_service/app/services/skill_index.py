@@ -0,0 +1,148 @@
+import os
+import re
+import json
+from collections import deque
+
+# Skill extraction against a versioned taxonomy (canonical skill -> aliases).
+# The taxonomy is compiled once into a matcher; lookups cost the same whether
+# it holds a hundred skills or tens of thousands.
+#   SKILL_MATCHER=aho    token-level Aho-Corasick automaton (default, no extra deps)
+#   SKILL_MATCHER=spacy  spaCy PhraseMatcher on the tokenizer only
+
+DEFAULT_TAXONOMY = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "skills_taxonomy.json")
+SKILLS_TAXONOMY = os.environ.get("SKILLS_TAXONOMY", DEFAULT_TAXONOMY)
+SKILL_MATCHER = os.environ.get("SKILL_MATCHER", "aho")
+SPACY_CHUNK_CHARS = int(os.environ.get("SPACY_CHUNK_CHARS", "5000"))
+
+# Tokens keep '.', '+' and '#' so node.js, c++, c# and .net survive;
+# '/', '-' and whitespace separate tokens, so "ci/cd", "ci-cd" and "ci cd" all match.
+_TOKEN_RE = re.compile(r"[a-z0-9.+#]+")
+
+
+def tokenize(text: str):
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        # Sentence punctuation ("...with Python.") is not part of the skill
+        token = token.rstrip(".")
+        if token:
+            tokens.append(token)
+    return tokens
+
+
+def load_taxonomy(path: str = None):
+    """Returns (version, {alias or canonical name: canonical name})."""
+    with open(path or SKILLS_TAXONOMY, encoding="utf-8") as f:
+        data = json.load(f)
+    patterns = {}
+    for canonical, aliases in data["skills"].items():
+        for phrase in [canonical, *aliases]:
+            patterns.setdefault(phrase.lower(), canonical)
+    return str(data.get("version", "unversioned")), patterns
+
+
+def _longest_non_overlapping(matches):
+    # Prefer "react native" over the "react" inside it
+    chosen = set()
+    last_end = -1
+    for start, end, canonical in sorted(matches, key=lambda m: (m[0], m[0] - m[1])):
+        if start >= last_end:
+            chosen.add(canonical)
+            last_end = end
+    return chosen
+
+
+def _chunks(text: str):
+    # Skills never span a blank line, so paragraphs are safe split points
+    chunk = []
+    size = 0
+    for paragraph in re.split(r"\n\s*\n", text):
+        if size + len(paragraph) > SPACY_CHUNK_CHARS and chunk:
+            yield "\n\n".join(chunk)
+            chunk, size = [], 0
+        chunk.append(paragraph)
+        size += len(paragraph)
+    if chunk:
+        yield "\n\n".join(chunk)
+
+
+class AhoCorasickSkillIndex:
+    """Aho-Corasick automaton whose alphabet is tokens, which gives word-boundary matching for free."""
+
+    def __init__(self, patterns: dict):
+        self.goto = [{}]
+        self.fail = [0]
+        # (pattern length in tokens, canonical) for every pattern ending at this node
+        self.out = [[]]
+
+        for phrase, canonical in patterns.items():
+            tokens = tokenize(phrase)
+            if not tokens:
+                continue
+            node = 0
+            for token in tokens:
+                nxt = self.goto[node].get(token)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[node][token] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                node = nxt
+            self.out[node].append((len(tokens), canonical))
+
+        # Breadth-first pass to wire failure links
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for token, child in self.goto[node].items():
+                queue.append(child)
+                f = self.fail[node]
+                while f and token not in self.goto[f]:
+                    f = self.fail[f]
+                target = self.goto[f].get(token, 0)
+                self.fail[child] = target if target != child else 0
+                self.out[child].extend(self.out[self.fail[child]])
+
+    def find(self, text: str):
+        goto, fail, out = self.goto, self.fail, self.out
+        matches = []
+        node = 0
+        for i, token in enumerate(tokenize(text)):
+            while node and token not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(token, 0)
+            for length, canonical in out[node]:
+                matches.append((i - length + 1, i + 1, canonical))
+        return _longest_non_overlapping(matches)
+
+
+class SpacySkillIndex:
+    """Same contract on top of spaCy's PhraseMatcher (case-insensitive via the LOWER attribute)."""
+
+    def __init__(self, patterns: dict, nlp):
+        from spacy.matcher import PhraseMatcher
+
+        self.nlp = nlp
+        self.matcher = PhraseMatcher(nlp.vocab, attr="LOWER")
+        by_canonical = {}
+        for phrase, canonical in patterns.items():
+            by_canonical.setdefault(canonical, []).append(phrase)
+        for canonical, phrases in by_canonical.items():
+            self.matcher.add(canonical, [nlp.make_doc(p) for p in phrases])
+
+    def find(self, text: str):
+        # Long resumes go through nlp.pipe in paragraph-sized pieces instead of one huge Doc
+        found = set()
+        for doc in self.nlp.pipe(_chunks(text)):
+            matches = [
+                (start, end, self.nlp.vocab.strings[match_id])
+                for match_id, start, end in self.matcher(doc)
+            ]
+            found |= _longest_non_overlapping(matches)
+        return found
+
+
+def build_skill_index(patterns: dict, matcher: str = None, nlp=None):
+    if (matcher or SKILL_MATCHER) == "spacy":
+        return SpacySkillIndex(patterns, nlp)
+    return AhoCorasickSkillIndex(patterns)
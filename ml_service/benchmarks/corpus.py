@@ -0,0 +1,127 @@
+"""
+Synthetic benchmark corpus: speech-like answers (WAV, and WebM/Opus when ffmpeg
+is available) of several lengths and text resumes as PDFs of several page counts.
+Everything is generated from fixed seeds, so the corpus is identical on every machine.
+
+Usage (from ml_service/):
+    python -m benchmarks.corpus --out benchmarks/corpus
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import wave
+
+import numpy as np
+
+from benchmarks.pitch_engines import synth_answer, SR
+
+AUDIO_SECONDS = (5, 20, 60)
+RESUME_PAGES = (1, 3, 8)
+LINES_PER_PAGE = 45
+
+SKILLS = ["Python", "JavaScript", "TypeScript", "React", "Node.js", "PostgreSQL", "Docker", "Kubernetes",
+          "AWS", "CI/CD", "Machine Learning", "FastAPI", "Java", "C++", "Git", "MongoDB", "Redis", "GraphQL"]
+PHRASES = ["Designed and shipped", "Led the migration of", "Reduced latency of", "Built monitoring for",
+           "Mentored engineers on", "Automated deployment of", "Owned the roadmap for", "Refactored"]
+OBJECTS = ["the payments service", "an internal analytics platform", "a customer-facing dashboard",
+           "the search backend", "a data ingestion pipeline", "the mobile API gateway"]
+
+
+def write_wav(path: str, y: np.ndarray):
+    pcm = (np.clip(y, -1.0, 1.0) * 32767).astype(np.int16)
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SR)
+        f.writeframes(pcm.tobytes())
+
+
+def wav_to_webm(wav_path: str, webm_path: str):
+    """Same container/codec the browser MediaRecorder produces. Returns False without ffmpeg."""
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        return False
+    subprocess.run(
+        [ffmpeg, "-hide_banner", "-loglevel", "error", "-y", "-i", wav_path, "-c:a", "libopus", "-b:a", "32k", webm_path],
+        check=True,
+    )
+    return True
+
+
+def resume_lines(pages: int, seed: int):
+    rng = random.Random(seed)
+    lines = ["Jordan Example - Software Engineer", "Skills: " + ", ".join(rng.sample(SKILLS, 10)), ""]
+    while len(lines) < pages * LINES_PER_PAGE:
+        lines.append(f"- {rng.choice(PHRASES)} {rng.choice(OBJECTS)} using {rng.choice(SKILLS)} and {rng.choice(SKILLS)}.")
+    return lines[:pages * LINES_PER_PAGE]
+
+
+def _pdf_escape(text: str):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(lines: list):
+    """Minimal text-only PDF (Helvetica, LINES_PER_PAGE lines per page) that pdfminer parses like a real resume."""
+    pages = [lines[i:i + LINES_PER_PAGE] for i in range(0, len(lines), LINES_PER_PAGE)]
+    # 1: catalog, 2: page tree, 3: font, then a (page, content stream) pair per page
+    objects = [None, None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for page_lines in pages:
+        text = "BT /F1 10 Tf 50 800 Td 14 TL " + " ".join(f"({_pdf_escape(l)}) '" for l in page_lines) + " ET"
+        stream = text.encode("latin-1", "replace")
+        objects.append(None)
+        page_number = len(objects)
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        objects[page_number - 1] = (
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (page_number + 1)
+        )
+        kids.append(b"%d 0 R" % page_number)
+    objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objects[1] = b"<< /Type /Pages /Kids [" + b" ".join(kids) + b"] /Count %d >>" % len(pages)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref_at = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_at)
+    return bytes(out)
+
+
+def build_corpus(out_dir: str, seed: int = 7):
+    """Writes the corpus and a manifest.json describing it; returns the manifest."""
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = {"seed": seed, "audio": [], "resumes": []}
+    for seconds in AUDIO_SECONDS:
+        y, _ = synth_answer(seconds, seed=seed + seconds)
+        wav_path = os.path.join(out_dir, f"answer_{seconds}s.wav")
+        write_wav(wav_path, y)
+        manifest["audio"].append({"name": f"wav_{seconds}s", "path": wav_path, "seconds": seconds, "format": "wav"})
+        webm_path = os.path.join(out_dir, f"answer_{seconds}s.webm")
+        if wav_to_webm(wav_path, webm_path):
+            manifest["audio"].append({"name": f"webm_{seconds}s", "path": webm_path, "seconds": seconds, "format": "webm"})
+    for pages in RESUME_PAGES:
+        path = os.path.join(out_dir, f"resume_{pages}p.pdf")
+        with open(path, "wb") as f:
+            f.write(make_pdf(resume_lines(pages, seed + pages)))
+        manifest["resumes"].append({"name": f"pdf_{pages}p", "path": path, "pages": pages})
+    with open(os.path.join(out_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate the synthetic benchmark corpus")
+    parser.add_argument("--out", default=os.path.join("benchmarks", "corpus"))
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    manifest = build_corpus(args.out, args.seed)
+    print(f"Wrote {len(manifest['audio'])} audio clips and {len(manifest['resumes'])} resumes to {args.out}")
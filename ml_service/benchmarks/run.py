@@ -0,0 +1,462 @@
+"""
+End-to-end benchmark for the ML service endpoints.
+
+Starts the stub LLM (benchmarks/stub_llm.py) and the service under uvicorn,
+replays the synthetic corpus (benchmarks/corpus.py) against every endpoint at
+each concurrency level, and reports p50/p95/p99 latency, throughput and the
+peak RSS of the service process tree (API process + audio/PDF workers).
+
+Usage (from ml_service/):
+    python -m benchmarks.run                                   # everything, concurrency 1 and 4
+    python -m benchmarks.run --scenarios parse_resume,score --concurrency 1,8 --requests 40
+    python -m benchmarks.run --update-baseline                 # record benchmarks/baseline.json
+
+Results are compared against the baseline file when it exists; any scenario
+whose p95 or throughput is worse by more than --max-regression is flagged and
+the exit code is 1. Baselines are machine specific, record them on the
+machine you compare on. Request payloads are made unique per request so the
+result caches don't hide the real cost (--allow-cache turns that off).
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+import httpx
+import websockets
+
+from benchmarks.corpus import build_corpus
+from benchmarks.stub_llm import start_stub
+
+ML_SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(ML_SERVICE_DIR, "benchmarks", "baseline.json")
+DEFAULT_CORPUS = os.path.join(ML_SERVICE_DIR, "benchmarks", "corpus")
+
+ANSWER = ("A REST API exposes resources over HTTP using standard verbs. I would version it, "
+          "validate input at the edge, paginate list endpoints and return consistent error bodies.")
+QUESTION = "How would you design a REST API for a multi-tenant SaaS product?"
+KEYWORDS = ["versioning", "pagination", "validation", "idempotency"]
+RESUME = "Backend engineer: Python, PostgreSQL, Docker, AWS."
+TOPICS = ["Python", "SQL", "Docker", "AWS"]
+# Streamed answers are sent in chunks of this size, roughly what a recorder emits every second or two
+CHUNK_BYTES = 16 * 1024
+
+
+# ---------------------------------------------------------------- process RSS
+
+def _children(pid: int):
+    try:
+        import psutil
+        return [p.pid for p in psutil.Process(pid).children(recursive=True)]
+    except ImportError:
+        pass
+    parents = {}
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    # ppid is the 2nd field after the parenthesised command name
+                    parents[int(entry)] = int(f.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+    found, frontier = [], [pid]
+    while frontier:
+        parent = frontier.pop()
+        kids = [p for p, pp in parents.items() if pp == parent]
+        found.extend(kids)
+        frontier.extend(kids)
+    return found
+
+
+def _rss_mb(pid: int):
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError, AttributeError):
+        try:
+            import psutil
+            return psutil.Process(pid).memory_info().rss / 1e6
+        except Exception:
+            return 0.0
+
+
+class RssSampler:
+    """Samples the summed RSS of a process tree on a background thread and keeps the peak."""
+
+    def __init__(self, pid: int, interval: float = 0.05):
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        if self.pid:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        children, last_scan = [], 0.0
+        while not self._stop.is_set():
+            # Re-scanning /proc is the expensive part; worker processes change rarely
+            if time.monotonic() - last_scan > 1.0:
+                children, last_scan = _children(self.pid), time.monotonic()
+            self.peak = max(self.peak, sum(_rss_mb(p) for p in [self.pid, *children]))
+            self._stop.wait(self.interval)
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+
+# ---------------------------------------------------------------- scenarios
+
+def build_scenarios(manifest: dict, bust_cache: bool):
+    """
+    name -> (method, path, payload(i) -> request kwargs, needs_ffmpeg). Method "WS"
+    opens a websocket and sends payload(i)["messages"] in order.
+    """
+    def unique(i):
+        return f" (benchmark run {time.time_ns()}-{i})" if bust_cache else ""
+
+    scenarios = {}
+    for resume in manifest["resumes"]:
+        with open(resume["path"], "rb") as f:
+            pdf = f.read()
+
+        def resume_payload(i, pdf=pdf):
+            # Bytes after %%EOF are ignored by PDF readers but change the content hash
+            data = pdf + f"% {unique(i)}\n".encode() if bust_cache else pdf
+            return {"files": {"file": ("resume.pdf", data, "application/pdf")}}
+        scenarios[f"parse_resume_{resume['name']}"] = ("POST", "/parse_resume", resume_payload, False)
+
+    for clip in manifest["audio"]:
+        with open(clip["path"], "rb") as f:
+            audio = f.read()
+
+        def audio_payload(i, audio=audio, clip=clip):
+            # Trailing bytes after the WAV data chunk or the last WebM cluster are ignored by ffmpeg
+            data = audio + unique(i).encode() if bust_cache else audio
+            return {"files": {"file": (os.path.basename(clip["path"]), data, f"audio/{clip['format']}")}}
+        scenarios[f"analyze_audio_{clip['name']}"] = ("POST", "/analyze_audio", audio_payload, True)
+
+        # The streaming endpoints don't cache, so the clip is sent as is
+        chunks = [audio[n:n + CHUNK_BYTES] for n in range(0, len(audio), CHUNK_BYTES)]
+
+        def stream_payload(i, chunks=chunks, clip=clip):
+            async def body():
+                for chunk in chunks:
+                    yield chunk
+            return {"params": {"format": clip["format"]}, "content": body()}
+        scenarios[f"analyze_audio_stream_{clip['name']}"] = ("POST", "/analyze_audio/stream", stream_payload, True)
+
+        def ws_payload(i, chunks=chunks, clip=clip):
+            return {"params": {"format": clip["format"]}, "messages": [*chunks, "end"]}
+        scenarios[f"ws_analyze_audio_{clip['name']}"] = ("WS", "/ws/analyze_audio", ws_payload, True)
+
+    scenarios["score_answer"] = ("POST", "/score_answer", lambda i: {"json": {
+        "answer_text": ANSWER + unique(i), "question_text": QUESTION, "ideal_keywords": KEYWORDS,
+    }}, False)
+
+    def batch(pack):
+        return lambda i: {"json": {"pack_short": pack, "answers": [
+            {"answer_text": f"Answer {n}: {ANSWER}{unique(i)}", "question_text": QUESTION, "ideal_keywords": KEYWORDS}
+            for n in range(8)
+        ]}}
+    scenarios["score_answers_batch_8"] = ("POST", "/score_answers_batch", batch(False), False)
+    scenarios["score_answers_batch_8_packed"] = ("POST", "/score_answers_batch", batch(True), False)
+
+    scenarios["generate_questions"] = ("POST", "/generate_questions", lambda i: {"json": {
+        "resume_text": RESUME + unique(i), "topics": ["Python", "SQL"], "count": 3, "difficulty": 3,
+    }}, False)
+    # Timed to the first question event
+    scenarios["generate_questions_stream"] = ("POST", "/generate_questions/stream", lambda i: {"json": {
+        "resume_text": RESUME + unique(i), "topics": ["Python", "SQL"], "count": 3, "difficulty": 3,
+    }}, False)
+    # Only the request that starts the prefetch; the generations it schedules run in the background
+    scenarios["prefetch_questions"] = ("POST", "/prefetch_questions", lambda i: {"json": {
+        "session_id": f"benchmark-{time.time_ns()}-{i}", "resume_text": RESUME + unique(i),
+        "topics": ["Python", "SQL"], "current_difficulty": 3,
+        "user_id": f"benchmark-user-{i % 50}", "topic": TOPICS[i % len(TOPICS)],
+    }}, False)
+    scenarios["suggest_difficulty"] = ("POST", "/suggest_difficulty", lambda i: {"json": {
+        "current_difficulty": 3, "last_score": 72,
+    }}, False)
+
+    # Adaptive difficulty, spread over a fixed set of users so later requests hit known ratings
+    scenarios["adaptive_record"] = ("POST", "/adaptive/record", lambda i: {"json": {
+        "user_id": f"benchmark-user-{i % 50}", "topic": TOPICS[i % len(TOPICS)],
+        "difficulty": 1 + i % 5, "score": (i * 37) % 100,
+    }}, False)
+    scenarios["adaptive_next_batch_8"] = ("POST", "/adaptive/next_batch", lambda i: {"json": {"items": [
+        {"user_id": f"benchmark-user-{(i + n) % 50}", "topic": TOPICS[n % len(TOPICS)]} for n in range(8)
+    ]}}, False)
+    scenarios["adaptive_start"] = ("POST", "/adaptive/start", lambda i: {"json": {
+        "user_id": f"benchmark-user-{i % 50}", "topics": TOPICS,
+    }}, False)
+    scenarios["adaptive_stats"] = ("GET", "/adaptive/stats", lambda i: {}, False)
+    return scenarios
+
+
+def percentile(sorted_values: list, q: float):
+    if not sorted_values:
+        return None
+    k = (len(sorted_values) - 1) * q
+    lo, hi = int(k), min(int(k) + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+async def _websocket_answer(url: str, path: str, params: dict, messages: list):
+    """Sends the messages and waits for the final result; returns 200 or the close code."""
+    query = "&".join(f"{k}={v}" for k, v in params.items())
+    async with websockets.connect(f"{url}{path}?{query}", max_size=None) as ws:
+        for message in messages:
+            await ws.send(message)
+        async for reply in ws:
+            if json.loads(reply).get("type") == "final":
+                return 200
+    return ws.close_code
+
+
+async def run_scenario(client, method, path, payload, requests: int, concurrency: int, pid: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, statuses = [], {}
+
+    async def one(i):
+        async with semaphore:
+            kwargs = payload(i)
+            started = time.perf_counter()
+            try:
+                if method == "WS":
+                    ws_url = str(client.base_url).rstrip("/").replace("http", "ws", 1)
+                    status = await _websocket_answer(ws_url, path, kwargs["params"], kwargs["messages"])
+                else:
+                    async with client.stream(method, path, **kwargs) as response:
+                        status = response.status_code
+                        if response.headers.get("content-type", "").startswith("text/event-stream"):
+                            # Timed to the first event, i.e. what the candidate waits for
+                            async for line in response.aiter_lines():
+                                if line.startswith("event:"):
+                                    break
+                        else:
+                            await response.aread()
+            except (httpx.HTTPError, websockets.WebSocketException, OSError) as e:
+                status = type(e).__name__
+            elapsed = time.perf_counter() - started
+            statuses[status] = statuses.get(status, 0) + 1
+            if status == 200:
+                latencies.append(elapsed)
+
+    # One untimed request so first-use model loads don't land in the numbers
+    await one(-1)
+    latencies.clear()
+    statuses.clear()
+
+    with RssSampler(pid) as rss:
+        started = time.perf_counter()
+        await asyncio.gather(*[one(i) for i in range(requests)])
+        wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "ok": len(latencies),
+        "statuses": {str(k): v for k, v in statuses.items()},
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1) if latencies else None,
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1) if latencies else None,
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1) if latencies else None,
+        "mean_ms": round(statistics.mean(latencies) * 1000, 1) if latencies else None,
+        "throughput_rps": round(len(latencies) / wall, 2) if wall > 0 else None,
+        "peak_rss_mb": round(rss.peak, 1) if pid else None,
+    }
+
+
+# ---------------------------------------------------------------- service lifecycle
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_service(llm_url: str, extra_env: dict):
+    port = _free_port()
+    env = {
+        **os.environ,
+        "GROQ_BASE_URL": llm_url,
+        "GROQ_API_KEY": os.environ.get("GROQ_API_KEY") or "stub",
+        "QUESTION_BANK_ENABLED": "0",
+        "LLM_REQUESTS_PER_MINUTE": "100000",
+        **extra_env,
+    }
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=ML_SERVICE_DIR,
+        env=env,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"ML service exited with code {process.returncode} during startup")
+        try:
+            if httpx.get(url + "/", timeout=1).status_code == 200:
+                return process, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    process.kill()
+    raise RuntimeError("ML service did not become healthy within 120s")
+
+
+# ---------------------------------------------------------------- baseline
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=ML_SERVICE_DIR).stdout.strip()
+    except OSError:
+        return None
+
+
+def compare(results: dict, baseline: dict, max_regression: float):
+    """Prints the per-scenario change against the baseline; returns the list of regressions."""
+    regressions = []
+    print(f"\nAgainst baseline from commit {baseline.get('commit')} ({baseline.get('recorded_at')}):")
+    machine = baseline.get("machine", {})
+    print(f"  recorded on {machine.get('platform')}, {machine.get('cpus')} CPUs" + (f" ({baseline['note']})" if baseline.get("note") else ""))
+    available = sorted(name for name, report in (baseline.get("models") or {}).items() if report.get("available"))
+    print(f"  models loaded in the service: {', '.join(available) or 'none'}")
+    print(f"{'scenario':<44}{'p50':>10}{'p95':>10}{'rps':>10}{'rss':>10}")
+    for key, current in results.items():
+        before = baseline.get("results", {}).get(key)
+        if not before or not current.get("p95_ms") or not before.get("p95_ms"):
+            continue
+
+        def change(field):
+            if current.get(field) is None or not before.get(field):
+                return None
+            return (current[field] - before[field]) / before[field]
+
+        p50, p95, rps, rss = change("p50_ms"), change("p95_ms"), change("throughput_rps"), change("peak_rss_mb")
+        fmt = lambda c: f"{c:+.0%}" if c is not None else "-"
+        flag = ""
+        if (p95 is not None and p95 > max_regression) or (rps is not None and rps < -max_regression):
+            regressions.append(key)
+            flag = "  REGRESSION"
+        print(f"{key:<44}{fmt(p50):>10}{fmt(p95):>10}{fmt(rps):>10}{fmt(rss):>10}{flag}")
+    return regressions
+
+
+# ---------------------------------------------------------------- main
+
+async def run_all(args, scenarios, url, pid):
+    """Returns (results, models): models is the service's /models report after the run."""
+    results = {}
+    async with httpx.AsyncClient(base_url=url, timeout=args.timeout) as client:
+        for name, (method, path, payload, _) in scenarios.items():
+            for concurrency in args.concurrency:
+                key = f"{name}@c{concurrency}"
+                result = await run_scenario(client, method, path, payload, args.requests, concurrency, pid)
+                results[key] = result
+                print(
+                    f"{key:<44}{result['ok']:>5}/{result['requests']:<5}"
+                    f"{result['p50_ms'] or '-':>10}{result['p95_ms'] or '-':>10}{result['p99_ms'] or '-':>10}"
+                    f"{result['throughput_rps'] or '-':>10}{result['peak_rss_mb'] or '-':>10}"
+                )
+        # Whether e.g. Vosk was really loaded; without it the audio numbers leave out ASR
+        try:
+            models = (await client.get("/models")).json().get("models")
+        except (httpx.HTTPError, ValueError):
+            models = None
+    return results, models
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ML service endpoints")
+    parser.add_argument("--scenarios", default="", help="comma separated name prefixes (default: all)")
+    parser.add_argument("--concurrency", default="1,4")
+    parser.add_argument("--requests", type=int, default=20, help="timed requests per scenario and concurrency level")
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--url", help="benchmark an already running service instead of starting one")
+    parser.add_argument("--pid", type=int, help="with --url: service PID for RSS sampling")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="stub LLM seconds per completion")
+    parser.add_argument("--env", action="append", default=[], help="KEY=VALUE for the started service, repeatable")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--allow-cache", action="store_true", help="repeat identical payloads so caches can hit")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--note", help="free-text note stored with the results, e.g. where a baseline was recorded")
+    parser.add_argument("--max-regression", type=float, default=0.15)
+    parser.add_argument("--output", help="also write the results JSON here")
+    args = parser.parse_args()
+    args.concurrency = [int(c) for c in args.concurrency.split(",")]
+
+    manifest = build_corpus(args.corpus)
+    scenarios = build_scenarios(manifest, bust_cache=not args.allow_cache)
+    if args.scenarios:
+        prefixes = [p.strip() for p in args.scenarios.split(",") if p.strip()]
+        scenarios = {k: v for k, v in scenarios.items() if any(k.startswith(p) for p in prefixes)}
+    if not args.url and not shutil.which("ffmpeg"):
+        skipped = [k for k, v in scenarios.items() if v[3]]
+        scenarios = {k: v for k, v in scenarios.items() if not v[3]}
+        if skipped:
+            print(f"ffmpeg not found, skipping {', '.join(skipped)}")
+
+    stub = process = None
+    try:
+        if args.url:
+            url, pid = args.url.rstrip("/"), args.pid
+        else:
+            stub, llm_url = start_stub(latency=args.llm_latency)
+            process, url = start_service(llm_url, dict(e.split("=", 1) for e in args.env))
+            pid = process.pid
+
+        print(f"{'scenario':<44}{'ok':>11}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'rps':>10}{'rss MB':>10}")
+        results, models = asyncio.run(run_all(args, scenarios, url, pid))
+    finally:
+        if process:
+            process.terminate()
+            try:
+                process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if stub:
+            stub.shutdown()
+
+    record = {
+        "commit": _git_commit(),
+        "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()},
+        "note": args.note,
+        "models": models,
+        "settings": {"requests": args.requests, "llm_latency": args.llm_latency, "env": args.env, "allow_cache": args.allow_cache},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(record, f, indent=2)
+
+    regressions = []
+    if os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.max_regression)
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(record, f, indent=2, sort_keys=True)
+        print(f"\nBaseline written to {args.baseline}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
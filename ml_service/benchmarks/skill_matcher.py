@@ -0,0 +1,108 @@
+"""
+Skill extraction time as the taxonomy grows.
+
+Usage (from ml_service/):
+    python -m benchmarks.skill_matcher
+    python -m benchmarks.skill_matcher --sizes 1000,10000,50000 --matchers aho,spacy
+
+The real taxonomy is padded with synthetic skill names (single and multi-word)
+up to each size. 'substring' is the original known_skills loop and 'regex' is
+the same loop with \\b boundaries; both scan the resume once per skill.
+"""
+import argparse
+import random
+import re
+import statistics
+import time
+
+from app.services.skill_index import load_taxonomy, build_skill_index
+
+SYLLABLES = ["ka", "zo", "ri", "mex", "tal", "vor", "qui", "len", "dra", "sio", "pum", "nix", "bel", "tro", "gan"]
+
+RESUME_TEMPLATE = """
+Senior software engineer with 6 years of experience building distributed systems.
+Skills: Python, JavaScript, TypeScript, React, Node.js, PostgreSQL, Docker, Kubernetes, AWS, CI/CD.
+Led migration of a monolith to microservices using Spring Boot and Kafka; set up GitHub Actions pipelines.
+Built machine learning models in PyTorch and scikit-learn for demand forecasting; deployed with FastAPI.
+Digital marketing analytics dashboards in Tableau and Power BI. Mentored junior developers in agile teams.
+"""
+
+
+def synthetic_patterns(base: dict, size: int, seed: int):
+    rng = random.Random(seed)
+    patterns = dict(base)
+    while len(patterns) < size:
+        words = ["".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(rng.randint(1, 3))]
+        name = " ".join(words)
+        patterns.setdefault(name, name)
+    return patterns
+
+
+def resume_text(words: int, seed: int):
+    rng = random.Random(seed)
+    filler = "designed implemented scalable reliable services for customers across teams and regions with measurable impact".split()
+    parts = [RESUME_TEMPLATE]
+    while sum(len(p.split()) for p in parts) < words:
+        parts.append(" ".join(rng.choice(filler) for _ in range(20)) + ".")
+    return "\n".join(parts)
+
+
+def substring_matcher(patterns):
+    skills = list(patterns.items())
+
+    def find(text):
+        text_lower = text.lower()
+        return {canonical for phrase, canonical in skills if phrase in text_lower}
+    return find
+
+
+def regex_matcher(patterns):
+    compiled = [(re.compile(r"(?<!\w)" + re.escape(phrase) + r"(?!\w)"), canonical) for phrase, canonical in patterns.items()]
+
+    def find(text):
+        text_lower = text.lower()
+        return {canonical for pattern, canonical in compiled if pattern.search(text_lower)}
+    return find
+
+
+def build(name, patterns):
+    if name == "substring":
+        return substring_matcher(patterns)
+    if name == "regex":
+        return regex_matcher(patterns)
+    if name == "spacy":
+        import spacy
+        return build_skill_index(patterns, matcher="spacy", nlp=spacy.blank("en")).find
+    return build_skill_index(patterns, matcher="aho").find
+
+
+def run(sizes, matchers, words, repeats, seed):
+    _, base = load_taxonomy()
+    text = resume_text(words, seed)
+    print(f"resume: {len(text.split())} words, {repeats} runs per cell (median)")
+    header = f"{'patterns':>10}{'matcher':>12}{'build ms':>12}{'extract ms':>12}{'skills':>8}"
+    print(header)
+    print("-" * len(header))
+    for size in sizes:
+        patterns = synthetic_patterns(base, size, seed)
+        for name in matchers:
+            start = time.perf_counter()
+            find = build(name, patterns)
+            build_ms = (time.perf_counter() - start) * 1000
+            timings = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                found = find(text)
+                timings.append((time.perf_counter() - start) * 1000)
+            print(f"{len(patterns):>10}{name:>12}{build_ms:>12.1f}{statistics.median(timings):>12.3f}{len(found):>8}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark skill matchers against taxonomy size")
+    parser.add_argument("--sizes", default="250,1000,10000,50000")
+    parser.add_argument("--matchers", default="substring,regex,aho", help="any of substring, regex, aho, spacy")
+    parser.add_argument("--words", type=int, default=800, help="resume length in words")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+    run([int(s) for s in args.sizes.split(",")], args.matchers.split(","), args.words, args.repeats, args.seed)
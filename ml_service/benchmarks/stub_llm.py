@@ -0,0 +1,152 @@
+"""
+Local stand-in for the Groq chat completions API, so benchmarks measure the
+service and not the network or the rate limit. Point the service at it with
+GROQ_BASE_URL=http://127.0.0.1:<port> (the Groq SDK reads that variable).
+
+Replies are canned but shaped like the real ones: question lists for
+generation prompts, score objects for scoring prompts (one per item for packed
+batches). Latency is a fixed base plus a per-output-token cost. Requests with
+"stream": true get the same reply as server-sent chunks.
+
+Usage (from ml_service/):
+    python -m benchmarks.stub_llm --port 8099 --latency 0.3
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _question(topic: str, difficulty: int, n: int):
+    return {
+        "question_text": f"[stub] Explain how you would use {topic} in a production system (variant {n}).",
+        "topic": topic,
+        "difficulty_level": difficulty,
+        "ideal_answer_keywords": [topic.lower(), "trade-offs", "testing"],
+        "ideal_answer_text": f"A good answer covers where {topic} fits, its trade-offs and how it is tested.",
+    }
+
+
+def _scores(rng: random.Random):
+    semantic, keyword, grammar = rng.randint(40, 95), rng.randint(30, 95), rng.randint(50, 95)
+    return {
+        "semantic_score": semantic,
+        "keyword_score": keyword,
+        "grammar_score": grammar,
+        "final_score": round(semantic * 0.5 + keyword * 0.3 + grammar * 0.2),
+        "feedback_text": "Stub feedback: clear structure, mention concrete trade-offs next time.",
+    }
+
+
+def reply_for(messages: list, rng: random.Random):
+    system = next((m["content"] for m in messages if m.get("role") == "system"), "")
+    user = next((m["content"] for m in messages if m.get("role") == "user"), "")
+    if '"questions"' in system:
+        count = int((re.search(r"Generate (\d+)", user) or [None, 3])[1])
+        topics_line = re.search(r"Selected Topics: (.*)", user)
+        topics = [t.strip() for t in topics_line.group(1).split(",")] if topics_line else ["General"]
+        level = re.search(r"difficulty_level (\d)", user)
+        difficulty = int(level.group(1)) if level else rng.randint(1, 5)
+        return {"questions": [_question(topics[i % len(topics)], difficulty, i) for i in range(count)]}
+    if '"results"' in system:
+        items = sorted({int(i) for i in re.findall(r"Item (\d+)", user)}) or [1]
+        return {"results": [{"index": i, **_scores(rng)} for i in items]}
+    return _scores(rng)
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    latency = 0.3
+    per_token = 0.002
+    rng = random.Random(0)
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        content = json.dumps(reply_for(body.get("messages", []), self.rng))
+        completion_tokens = len(content) // 4
+        if body.get("stream"):
+            self._stream(body, content)
+            return
+        time.sleep(self.latency + self.per_token * completion_tokens)
+
+        payload = json.dumps({
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 200, "completion_tokens": completion_tokens, "total_tokens": 200 + completion_tokens},
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        # Generous limits so the gateway's rate limiter never kicks in during a benchmark
+        self.send_header("x-ratelimit-remaining-requests", "100000")
+        self.send_header("x-ratelimit-remaining-tokens", "10000000")
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+    def _stream(self, body: dict, content: str):
+        # Same pacing as a real completion: base latency to the first token, then per_token per ~4 characters
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("x-ratelimit-remaining-requests", "100000")
+        self.send_header("x-ratelimit-remaining-tokens", "10000000")
+        self.end_headers()
+        time.sleep(self.latency)
+        try:
+            self._send_chunks(body, content, completion_id)
+        except (BrokenPipeError, ConnectionResetError):
+            # The service stops reading once it has what it needs
+            pass
+        self.close_connection = True
+
+    def _send_chunks(self, body: dict, content: str, completion_id: str):
+        for start in range(0, len(content), 16):
+            piece = content[start:start + 16]
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get("model", "stub"),
+                "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+            time.sleep(self.per_token * len(piece) / 4)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+def start_stub(port: int = 0, latency: float = 0.3, per_token: float = 0.002):
+    """Starts the stub on a background thread; returns (server, base_url)."""
+    handler = type("Handler", (StubLLMHandler,), {"latency": latency, "per_token": per_token})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub Groq chat completions server")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", type=float, default=0.3, help="base seconds per completion")
+    parser.add_argument("--per-token", type=float, default=0.002, help="extra seconds per output token")
+    args = parser.parse_args()
+    server, url = start_stub(args.port, args.latency, args.per_token)
+    print(f"Stub LLM listening on {url} (set GROQ_BASE_URL={url})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
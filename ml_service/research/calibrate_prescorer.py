@@ -0,0 +1,160 @@
+import os
+import json
+import glob
+import argparse
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+# Fits the local pre-scorer (app/services/prescorer.py) to the LLM's own scores.
+# Input is an export with answer texts:
+#
+#   python research/export_data.py --include-text --full --out exports/
+#   python -m research.calibrate_prescorer exports/        (from ml_service/)
+#
+# 20% of the rows are held out. On the rest it fits one linear model per score
+# and picks the smallest error margin at which local low/high decisions agree
+# with the LLM at least --target-agreement of the time, then reports how the
+# result does on the held-out rows before writing the calibration file.
+
+from app.services import prescorer
+
+TARGETS = ["semantic_score", "keyword_score", "grammar_score"]
+MARGINS = [0.0, 0.25, 0.5, 0.75, 1.0, 1.25, 1.5, 2.0, 2.5, 3.0]
+
+
+def load_export(path):
+    files = [path] if os.path.isfile(path) else sorted(
+        glob.glob(os.path.join(path, "**", "*.csv"), recursive=True)
+        + glob.glob(os.path.join(path, "**", "*.parquet"), recursive=True)
+    )
+    if not files:
+        raise SystemExit(f"No export files under {path}")
+    df = pd.concat([pd.read_parquet(f) if f.endswith(".parquet") else pd.read_csv(f) for f in files], ignore_index=True)
+    if "answer_text" not in df.columns:
+        raise SystemExit("Export has no answer_text column; re-export with --include-text")
+    df = df.drop_duplicates("answer_id")
+    # Only typed answers carry real LLM scores (voice answers are stored as zeros)
+    df = df[df["answer_text"].fillna("").str.strip() != ""]
+    df = df.dropna(subset=TARGETS + ["final_score"])
+    return df.reset_index(drop=True)
+
+
+def _keywords(value):
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return [value]
+    return list(value) if value is not None and not isinstance(value, float) else []
+
+
+def compute_signals(df, batch_size=256):
+    items = [
+        {
+            "answer_text": row.answer_text,
+            "question_text": row.question_text,
+            "ideal_answer_text": row.ideal_answer_text if isinstance(row.ideal_answer_text, str) else None,
+            "ideal_keywords": _keywords(row.ideal_answer_keywords),
+        }
+        for row in df.itertuples()
+    ]
+    signals = []
+    for start in range(0, len(items), batch_size):
+        signals.extend(prescorer.features(items[start:start + batch_size]))
+        print(f"  signals for {len(signals)}/{len(items)} answers")
+    return signals
+
+
+def design_matrix(signals):
+    return np.array([[1.0, s["similarity"], s["coverage"], np.log1p(s["words"])] for s in signals])
+
+
+def fit(df, signals, calibration):
+    X = design_matrix(signals)
+    models = {}
+    for target in TARGETS:
+        coef, *_ = np.linalg.lstsq(X, df[target].to_numpy(dtype=float), rcond=None)
+        models[target] = {"coef": [round(float(c), 4) for c in coef]}
+    calibration = {**calibration, "models": models, "band": None}
+    predicted = np.array([_composed(calibration, s) for s in signals])
+    calibration["final_resid_std"] = round(float(np.std(df["final_score"].to_numpy(dtype=float) - predicted)), 3)
+    return calibration
+
+
+def _composed(calibration, signals):
+    scores = {t: prescorer._predict(calibration["models"][t], signals) for t in TARGETS}
+    return 0.5 * scores["semantic_score"] + 0.3 * scores["keyword_score"] + 0.2 * scores["grammar_score"]
+
+
+def evaluate(calibration, df, signals, low, high):
+    """Share of answers scored locally, and how often the LLM agrees with the local side of the band."""
+    prescorer._calibration = calibration
+    decided, agree, errors, reasons = 0, 0, [], {}
+    for s, llm_final in zip(signals, df["final_score"].to_numpy(dtype=float)):
+        result = prescorer.decide(s)
+        if result is None:
+            continue
+        decided += 1
+        reason = result["local_reason"]
+        reasons[reason] = reasons.get(reason, 0) + 1
+        errors.append(abs(result["final_score"] - llm_final))
+        agree += llm_final <= low if reason != "high" else llm_final >= high
+    return {
+        "local_share": decided / max(len(signals), 1),
+        "agreement": agree / decided if decided else None,
+        "mae": float(np.mean(errors)) if errors else None,
+        "reasons": reasons,
+    }
+
+
+def calibrate(df, low, high, target_agreement, seed=0):
+    base = prescorer.load_calibration()
+    signals = compute_signals(df)
+    rng = np.random.default_rng(seed)
+    test = rng.random(len(df)) < 0.2
+    train_idx, test_idx = np.flatnonzero(~test), np.flatnonzero(test)
+    train_df, test_df = df.iloc[train_idx], df.iloc[test_idx]
+    train_signals = [signals[i] for i in train_idx]
+    test_signals = [signals[i] for i in test_idx]
+
+    calibration = fit(train_df, train_signals, base)
+    chosen = None
+    for margin in MARGINS:
+        candidate = {**calibration, "band": {"low": low, "high": high, "margin": margin}}
+        report = evaluate(candidate, train_df, train_signals, low, high)
+        print(f"  margin {margin:.2f}: local {report['local_share']:.0%}, agreement {report['agreement']}")
+        if report["agreement"] is not None and report["agreement"] >= target_agreement:
+            chosen = candidate
+            break
+    if chosen is None:
+        print("No margin reaches the target agreement; only the too-short/off-topic rules will be used")
+        chosen = calibration
+
+    held_out = evaluate(chosen, test_df, test_signals, low, high)
+    chosen.update({
+        "version": datetime.now().strftime("%Y%m%d"),
+        "samples": int(len(train_df)),
+        "held_out": {k: (round(v, 4) if isinstance(v, float) else v) for k, v in held_out.items()},
+    })
+    return chosen
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Calibrate the local pre-scorer against exported LLM scores")
+    parser.add_argument("export", help="export file or directory from research/export_data.py --include-text")
+    parser.add_argument("--low", type=float, default=40, help="answers confidently below this are scored locally")
+    parser.add_argument("--high", type=float, default=80, help="answers confidently above this are scored locally")
+    parser.add_argument("--target-agreement", type=float, default=0.95)
+    parser.add_argument("--out", default=prescorer.PRESCORER_CALIBRATION)
+    parser.add_argument("--dry-run", action="store_true", help="report only, don't write the calibration")
+    args = parser.parse_args()
+
+    df = load_export(args.export)
+    print(f"Calibrating on {len(df)} scored text answers")
+    calibration = calibrate(df, args.low, args.high, args.target_agreement)
+    print(f"Held out: {json.dumps(calibration['held_out'])}")
+    if not args.dry_run:
+        with open(args.out, "w") as f:
+            json.dump(calibration, f, indent=2)
+        print(f"Wrote {args.out}")